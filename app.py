@@ -5,22 +5,67 @@ Run: python3 app.py
 Open: http://localhost:8000
 """
 
-import sys, re, os, io, threading, queue, time, base64, json
-import urllib.request, urllib.parse
+from __future__ import annotations
+
+import sys, re, os, io, threading, queue, time, base64, json, hashlib, sqlite3, math, heapq, uuid, codecs, itertools, zlib, weakref, bisect, argparse, contextvars, importlib
+from contextlib import contextmanager
+from functools import lru_cache
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Optional
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse, urljoin, urlsplit, unquote
 from html.parser import HTMLParser
 from pathlib import Path
-from flask import Flask, Response, render_template_string, request, stream_with_context
-
-try:
-    from PIL import Image
-    import pytesseract
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
-
-app = Flask(__name__)
+from array import array
+
+class _Lazy:
+    """Stand-in for a module, or one attribute of it, imported on first use so
+    Flask, Pillow, pytesseract and the HTTP client cost nothing until needed."""
+
+    def __init__(self, module: str, attr: str = ''):
+        self._module, self._attr, self._obj = module, attr, None
+
+    def _load(self):
+        if self._obj is None:
+            obj = importlib.import_module(self._module)
+            self._obj = getattr(obj, self._attr) if self._attr else obj
+        return self._obj
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+Image       = _Lazy('PIL.Image')
+ImageFilter = _Lazy('PIL.ImageFilter')
+ImageStat   = _Lazy('PIL.ImageStat')
+pytesseract = _Lazy('pytesseract')
+http_client    = _Lazy('http.client')
+urllib_request = _Lazy('urllib.request')
+
+Response               = _Lazy('flask', 'Response')
+request                = _Lazy('flask', 'request')
+render_template_string = _Lazy('flask', 'render_template_string')
+stream_with_context    = _Lazy('flask', 'stream_with_context')
+
+@lru_cache(maxsize=None)
+def ocr_available() -> bool:
+    """Pillow and pytesseract import and the tesseract binary answers; probed once."""
+    try:
+        importlib.import_module('PIL.Image')
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+@lru_cache(maxsize=None)
+def lxml_available() -> bool:
+    try:
+        importlib.import_module('lxml.etree')
+        return True
+    except ImportError:
+        return False
 
 PSL = {
     'com','com.tr','org.tr','net.tr','gov.tr','edu.tr','mil.tr','k12.tr','av.tr','dr.tr','tel.tr','info.tr','name.tr',
@@ -51,92 +96,452 @@ PSL = {
     'com.eg','gov.eg','com.ng','gov.ng','com.sa','gov.sa','org.sa',
 }
 
+PSL_FILE = os.environ.get('CYBERSCOPE_PSL') or str(Path(__file__).with_name('public_suffix_list.dat'))
+
+class SuffixIndex:
+    """Public Suffix List rules (normal, wildcard and exception) compiled into
+    a reversed-label trie, so finding a host's public suffix is O(labels)."""
+
+    def __init__(self):
+        self._root = {}
+        self.size = 0
+        self.complete = False                   # True once a full list is loaded
+
+    def add(self, rule: str):
+        exc = rule.startswith('!')
+        node = self._root
+        for label in reversed(rule.lstrip('!').lower().split('.')):
+            node = node.setdefault(label, {})
+        node['!' if exc else '$'] = True
+        self.size += 1
+
+    def load(self, path: str) -> int:
+        n = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                rule = line.split(None, 1)[0] if line.strip() else ''
+                if not rule or rule.startswith('//'): continue
+                self.add(rule)
+                if not rule.isascii():
+                    try: self.add(rule.encode('idna').decode())
+                    except UnicodeError: pass
+                n += 1
+        self.complete = True
+        return n
+
+    def listed(self, tld: str) -> bool:
+        """Whether `tld` is the top-level label of any rule."""
+        return tld in self._root
+
+    def suffix_labels(self, labels: list) -> int:
+        """Number of trailing `labels` that form the public suffix."""
+        node, best = self._root, 1              # unlisted TLDs are suffixes too
+        for i, label in enumerate(reversed(labels)):
+            nxt = node.get(label)
+            if nxt is not None:
+                if '!' in nxt: return i         # exception: its parent is the suffix
+                if '$' in nxt: best = i + 1
+            wild = node.get('*')
+            if wild is not None and '$' in wild: best = max(best, i + 1)
+            if nxt is None: break
+            node = nxt
+        return best
+
+PSL_INDEX = None
+_PSL_LOCK = threading.Lock()
+
+def psl_index() -> SuffixIndex:
+    """The PSL trie, built from PSL_FILE on first use."""
+    global PSL_INDEX
+    if PSL_INDEX is None:
+        with _PSL_LOCK:
+            if PSL_INDEX is None:
+                index = SuffixIndex()
+                try:
+                    index.load(PSL_FILE)
+                except OSError:
+                    # no bundled list: fall back to the built-in two-label suffixes
+                    for r in PSL: index.add(r)
+                PSL_INDEX = index
+    return PSL_INDEX
+
+CLASSIFY_CACHE = 1 << 16
+
+@lru_cache(maxsize=CLASSIFY_CACHE)
 def base_domain(hostname: str) -> str:
     if not hostname: return ''
     hostname = hostname.lower().rstrip('.').split(':')[0]
     parts = hostname.split('.')
-    if len(parts) <= 1: return hostname
-    if len(parts) >= 3:
-        two = '.'.join(parts[-2:])
-        if two in PSL:
-            return '.'.join(parts[-3:])
-    return '.'.join(parts[-2:])
-
-CDN_RE = [
-    re.compile(r'\.cloudfront\.net$'), re.compile(r'\.akamai(hd|zed)?\.net$'),
-    re.compile(r'\.fastly\.net$'),      re.compile(r'\.cloudflare\.com$'),
-    re.compile(r'\.jsdelivr\.net$'),    re.compile(r'\.unpkg\.com$'),
-    re.compile(r'cdnjs\.cloudflare\.com$'), re.compile(r'\.googleapis\.com$'),
-    re.compile(r'\.gstatic\.com$'),     re.compile(r'\.amazonaws\.com$'),
-    re.compile(r'\.azureedge\.net$'),   re.compile(r'\.twimg\.com$'),
-    re.compile(r'\.fbcdn\.net$'),       re.compile(r'\.cloudinary\.com$'),
-    re.compile(r'\.imgix\.net$'),       re.compile(r'\.wp\.com$'),
-    re.compile(r'\.staticflickr\.com$'),re.compile(r'\.bunnycdn\.com$'),
+    if len(parts) <= 1 or parts[-1].isdigit(): return hostname      # bare label or IPv4
+    n = (PSL_INDEX or psl_index()).suffix_labels(parts)
+    if len(parts) <= n: return hostname
+    return '.'.join(parts[-n - 1:])
+
+CDN_SUFFIXES = [
+    'cloudfront.net', 'akamai.net', 'akamaihd.net', 'akamaized.net', 'fastly.net',
+    'cloudflare.com', 'jsdelivr.net', 'unpkg.com', 'cdnjs.cloudflare.com', 'googleapis.com',
+    'gstatic.com', 'amazonaws.com', 'azureedge.net', 'twimg.com', 'fbcdn.net',
+    'cloudinary.com', 'imgix.net', 'wp.com', 'staticflickr.com', 'bunnycdn.com',
 ]
-TRK_RE = [
-    re.compile(r'google-analytics\.com$'), re.compile(r'googletagmanager\.com$'),
-    re.compile(r'doubleclick\.net$'),       re.compile(r'googlesyndication\.com$'),
-    re.compile(r'segment\.com$'),           re.compile(r'mixpanel\.com$'),
-    re.compile(r'hotjar\.com$'),            re.compile(r'clarity\.ms$'),
-    re.compile(r'facebook\.com$'),          re.compile(r'connect\.facebook\.net$'),
+TRACKER_SUFFIXES = [
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googlesyndication.com',
+    'segment.com', 'mixpanel.com', 'hotjar.com', 'clarity.ms', 'facebook.com', 'connect.facebook.net',
 ]
-
+RULE_FILES     = os.environ.get('CYBERSCOPE_RULES', '')
+
+class DomainRules:
+    """Suffix rules ('CDN', 'TRACKER', …) in a reversed-label trie.
+
+    A rule matches the domain itself and every subdomain; the longest matching
+    suffix wins, so a lookup costs one dict step per label no matter how many
+    rules are loaded.
+    """
+
+    def __init__(self):
+        self._root = {}
+        self.size = 0
+
+    def add(self, suffix: str, category: str):
+        node = self._root
+        for label in reversed(suffix.lower().strip('.').split('.')):
+            node = node.setdefault(label, {})
+        if '' not in node: self.size += 1
+        node.setdefault('', category)           # first rule for a suffix wins
+
+    def match(self, host: str) -> Optional[str]:
+        node, found = self._root, None
+        for label in reversed(host.lower().rstrip('.').split('.')):
+            node = node.get(label)
+            if node is None: break
+            found = node.get('', found)
+        return found
+
+    def load(self, path: str, category: Optional[str] = None) -> int:
+        """Add rules from a text file: `CATEGORY suffix` per line, or bare
+        suffixes when `category` is given. '#' starts a comment."""
+        n = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                parts = line.split('#', 1)[0].split()
+                if not parts: continue
+                if category: cat, suffix = category, parts[-1]
+                elif len(parts) >= 2: cat, suffix = parts[0].upper(), parts[1]
+                else: continue
+                self.add(suffix, cat)
+                n += 1
+        return n
+
+RULES = DomainRules()
+for _s in CDN_SUFFIXES: RULES.add(_s, 'CDN')
+for _s in TRACKER_SUFFIXES: RULES.add(_s, 'TRACKER')
+
+def load_rules(path: str, category: Optional[str] = None) -> int:
+    """Extend the classifier with a rule file; returns the number of rules read."""
+    n = RULES.load(path, category)
+    classify.cache_clear()
+    return n
+
+@lru_cache(maxsize=CLASSIFY_CACHE)
 def classify(host: str, target_base: str) -> str:
     hb = base_domain(host)
     if hb == target_base:
         return 'PRIMARY' if host == target_base else 'SUBDOMAIN'
-    for r in CDN_RE:
-        if r.search(host): return 'CDN'
-    for r in TRK_RE:
-        if r.search(host): return 'TRACKER'
-    return 'EXTERNAL'
-
-class PageParser(HTMLParser):
-    def __init__(self, base_url: str):
-        super().__init__()
-        self.base_url = base_url
-        self.images = []
-        self.hosts = set()
+    return RULES.match(host) or 'EXTERNAL'
+
+for _f in filter(None, RULE_FILES.split(os.pathsep)):
+    load_rules(_f)
+
+class HostTable:
+    """Interned hostnames: each distinct host is stored once and referred to
+    by its index in `names`. Id 0 is the empty host."""
+    __slots__ = ('names', '_ids')
+
+    def __init__(self):
+        self.names = ['']
+        self._ids = {'': 0}
+
+    def intern(self, host: str) -> int:
+        i = self._ids.get(host)
+        if i is None:
+            i = self._ids[host] = len(self.names)
+            self.names.append(host)
+        return i
+
+    def __contains__(self, host: str) -> bool:
+        return host in self._ids
+
+    def __len__(self) -> int:
+        return len(self.names) - 1
+
+    def __iter__(self):
+        return itertools.islice(self.names, 1, None)
+
+IMAGE_EXTRAS = ('', 'srcset', 'css', 'link', 'meta')      # where an image reference came from
+_EXTRA_CODES = {e: i for i, e in enumerate(IMAGE_EXTRAS)}
+
+class ImageTable:
+    """The images of a scan as parallel columns, deduplicated by URL.
+
+    Hosts are HostTable ids in an array, alt texts are interned and the
+    `extra` marker is one byte, so a large crawl holds no per-image dicts.
+    """
+    __slots__ = ('hosts', 'url', 'alt', 'host', 'extra', '_seen')
+
+    def __init__(self, hosts: Optional[HostTable] = None):
+        self.hosts = hosts if hosts is not None else HostTable()
+        self.url = []
+        self.alt = []
+        self.host = array('I')
+        self.extra = array('B')
         self._seen = set()
 
-    def _resolve(self, src: str) -> Optional[str]:
-        if not src or src.startswith('javascript:'): return None
-        if src.startswith('data:'): return src
-        try: return urljoin(self.base_url, src)
-        except: return None
+    def add(self, url: str, alt: str, host: str, extra: str = '') -> bool:
+        if url in self._seen: return False
+        self._seen.add(url)
+        self.url.append(url)
+        self.alt.append(sys.intern(alt))
+        self.host.append(self.hosts.intern(host))
+        self.extra.append(_EXTRA_CODES.get(extra, 0))
+        return True
+
+    def __len__(self) -> int:
+        return len(self.url)
+
+    def rows(self, start: int = 0):
+        """(url, alt, host, extra) for every image from `start` on."""
+        names = self.hosts.names
+        for i in range(start, len(self.url)):
+            yield self.url[i], self.alt[i], names[self.host[i]], IMAGE_EXTRAS[self.extra[i]]
+
+    def counts(self, t_base: str) -> tuple:
+        """(images without alt text, images from another base domain) in one pass."""
+        ext = [bool(h) and base_domain(h) != t_base for h in self.hosts.names]
+        no_alt = external = 0
+        for alt, h in zip(self.alt, self.host):
+            if not alt: no_alt += 1
+            if ext[h]: external += 1
+        return no_alt, external
+
+HTML_PARSER = os.environ.get('CYBERSCOPE_HTML_PARSER', 'auto')     # auto (lxml if installed) | lxml | html
+
+_WANTED_ATTRS = frozenset(('src', 'href', 'action', 'data-src', 'data-lazy-src', 'data-original', 'srcset',
+                           'alt', 'content', 'http-equiv', 'property', 'name', 'rel', 'as', 'style'))
+_HOST_ATTRS   = ('src', 'href', 'action', 'data-src')
+_LINK_TAGS    = frozenset(('a', 'area', 'frame', 'iframe'))
+_ICON_RELS    = frozenset(('icon', 'apple-touch-icon', 'apple-touch-icon-precomposed', 'mask-icon', 'image_src'))
+_META_IMAGES  = frozenset(('og:image', 'og:image:url', 'og:image:secure_url', 'twitter:image', 'twitter:image:src'))
+_CSS_URL_RE   = re.compile(r"""url\(\s*(['"]?)([^'")\s]+)\1\s*\)""", re.I)
+_CSS_IMAGE_RE = re.compile(r'\.(?:png|jpe?g|gif|webp|avif|svg|bmp|ico)(?:[?#]|$)', re.I)
+_REFRESH_RE   = re.compile(r"""\s*[\d.]*\s*[;,]\s*url\s*=\s*['"]?([^'"\s]+)""", re.I)
+# absolute URLs that urljoin() would hand back unchanged
+_PLAIN_URL_RE = re.compile(r'https?://[^\x00-\x20/?#\[\];]+(?:[/?#][^\x00-\x20;]*)?')
+_AUTHORITY_RE = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*://([^/?#]*)')
+
+@lru_cache(maxsize=1 << 14)
+def _netloc_host(netloc: str) -> str:
+    try: return urlsplit('//' + netloc).hostname or ''
+    except ValueError: return ''
+
+def url_host(url: str) -> str:
+    """urlparse(url).hostname or '', with the authority cut out by a regex
+    and its host memoized."""
+    m = _AUTHORITY_RE.match(url)
+    if m: return _netloc_host(m.group(1))
+    try: return urlsplit(url).hostname or ''
+    except ValueError: return ''
+
+def _srcset(value: str):
+    for part in value.split(','):
+        part = part.split(None, 1)
+        if part: yield part[0]
+
+class _PageExtractor:
+    """What PageParser collects, independent of the tokenizer feeding it.
+
+    Start tags are cut down to the attributes of interest before anything
+    else; most tags have none and cost one pass over their attributes. URL
+    resolution is memoized per page, and absolute URLs that urljoin would
+    return unchanged skip it.
+    """
+
+    def _setup(self, base_url: str, scan_text: bool, images: Optional[ImageTable]):
+        self.base_url = base_url
+        self.images = images if images is not None else ImageTable()
+        self.hosts = self.images.hosts
+        self.links = []
+        self.text_hosts = set()
+        self.scan_text = scan_text
+        self._joined = {}
+        self._text = []
+        self._script = []
+        self._style = []
 
-    def _add_host(self, url: str):
+    def _resolve(self, src: str) -> Optional[str]:
+        url = self._joined.get(src)
+        if url is None:
+            if src.startswith('javascript:'): url = ''
+            elif src.startswith('data:') or (_PLAIN_URL_RE.fullmatch(src) and '?#' not in src
+                                             and not src.endswith(('?', '#'))):
+                url = src
+            else:
+                try: url = urljoin(self.base_url, src)
+                except ValueError: url = ''
+            self._joined[src] = url
+        return url or None
+
+    def _add_host(self, src: str):
+        url = self._resolve(src)
         if not url or url.startswith('data:'): return
-        try:
-            h = urlparse(url).hostname
-            if h: self.hosts.add(h)
-        except: pass
+        h = url_host(url)
+        if h: self.hosts.intern(h)
 
     def _add_image(self, src: str, alt: str = '', extra: str = ''):
         if not src or src.startswith('data:'): return
         url = self._resolve(src)
-        if not url or url in self._seen: return
-        self._seen.add(url)
-        try: host = urlparse(url).hostname or ''
-        except: host = ''
-        self.images.append({'url': url, 'alt': alt, 'host': host, 'extra': extra})
-        self._add_host(url)
+        if not url or url in self.images._seen: return
+        self.images.add(url, alt, url_host(url), extra)
+
+    def _css(self, css: str, inline: bool):
+        # inline style="" urls are backgrounds; <style> urls may be fonts, so only image paths count there
+        for m in _CSS_URL_RE.finditer(css):
+            src = m.group(2)
+            if inline or _CSS_IMAGE_RE.search(src): self._add_image(src, '', 'css')
+            else: self._add_host(src)
+
+    def _start(self, tag: str, attrs):
+        if self.scan_text: self._text.append('\n')
+        a = {k: v for k, v in attrs if v and k in _WANTED_ATTRS}
+        if not a: return
+        for key in _HOST_ATTRS:
+            if key in a: self._add_host(a[key])
+        if 'content' in a and tag != 'meta': self._add_host(a['content'])
+        if tag in _LINK_TAGS:
+            link = self._resolve(a.get('href') or a.get('src') or '')
+            if link and not link.startswith('data:'): self.links.append(link)
+        elif tag == 'img':
+            alt = a.get('alt', '')
+            self._add_image(a.get('src') or a.get('data-src') or a.get('data-lazy-src') or a.get('data-original', ''), alt)
+            if 'srcset' in a:
+                for src in _srcset(a['srcset']): self._add_image(src, alt, 'srcset')
+        elif tag == 'source':
+            if 'srcset' in a:
+                for src in _srcset(a['srcset']): self._add_image(src, '', 'srcset')
+        elif tag == 'link':
+            rel = set(a.get('rel', '').lower().split())
+            if 'href' in a and (rel & _ICON_RELS or ('preload' in rel and a.get('as') == 'image')):
+                self._add_image(a['href'], '', 'link')
+        elif tag == 'meta' and 'content' in a:
+            content = a['content']
+            if a.get('http-equiv', '').lower() == 'refresh':
+                m = _REFRESH_RE.match(content)
+                if m:
+                    self._add_host(m.group(1))
+                    link = self._resolve(m.group(1))
+                    if link: self.links.append(link)
+            elif (a.get('property') or a.get('name') or '').lower() in _META_IMAGES:
+                self._add_image(content, '', 'meta')
+            else:
+                self._add_host(content)
+        if 'style' in a: self._css(a['style'], inline=True)
+
+    def _data(self, data: str, elem: Optional[str]):
+        if elem == 'style': self._style.append(data)
+        if self.scan_text:
+            (self._script if elem else self._text).append(data)
+
+    def _end(self, tag: str):
+        # tokenizers split text at feed boundaries, so pieces are joined as-is
+        # and only tags separate them
+        if self.scan_text: (self._script if tag in ('script', 'style') else self._text).append('\n')
+        if tag == 'style' and self._style:
+            self._css(''.join(self._style), inline=False)
+            self._style = []
+
+    def _finish(self):
+        if not self.scan_text: return
+        found = extract_domains_from_text(''.join(self._text))
+        found += extract_domains_from_text(''.join(self._script), strict=True)
+        self._text, self._script = [], []
+        for d in found:
+            if d['host'] not in self.hosts:
+                self.text_hosts.add(d['host'])
+                self.hosts.intern(d['host'])
+
+class PageParser(_PageExtractor, HTMLParser):
+    """Hosts, images and links of one page: img/srcset, icon and preload
+    links, og:image, meta refresh and CSS url()s in style attributes and
+    <style>. With `scan_text`, visible text and inline scripts/styles are
+    also searched for domains on close(); those found nowhere else are
+    listed in `text_hosts`. Pages of one crawl can share an `images` table,
+    and with it the host table."""
+
+    def __init__(self, base_url: str, scan_text: bool = False, images: Optional[ImageTable] = None):
+        HTMLParser.__init__(self)
+        self._setup(base_url, scan_text, images)
 
     def handle_starttag(self, tag: str, attrs):
-        a = dict(attrs)
-        for key in ('src','href','action','data-src','content'):
-            if key in a: self._add_host(self._resolve(a[key]) or '')
-        if tag == 'img':
-            src = a.get('src') or a.get('data-src') or a.get('data-lazy-src') or a.get('data-original','')
-            alt = a.get('alt','')
-            self._add_image(src, alt)
-            for ss in (a.get('srcset','') or '').split(','):
-                part = ss.strip().split()[0] if ss.strip() else ''
-                if part: self._add_image(part, alt, 'srcset')
-        if tag == 'source':
-            for ss in (a.get('srcset','') or '').split(','):
-                part = ss.strip().split()[0] if ss.strip() else ''
-                if part: self._add_image(part,'','srcset')
+        self._start(tag, attrs)
+
+    def handle_endtag(self, tag: str):
+        self._end(tag)
+
+    def handle_data(self, data: str):
+        self._data(data, self.cdata_elem)
+
+    def close(self):
+        HTMLParser.close(self)
+        self._finish()
+
+class _LxmlTarget:
+    # lxml parser-target callbacks; no tree is built
+    __slots__ = ('page', 'raw')
+
+    def __init__(self, page: LxmlPageParser):
+        self.page, self.raw = page, None
+
+    def start(self, tag, attrib):
+        if not isinstance(tag, str): return       # comments and processing instructions
+        self.page._start(tag, attrib.items())
+        if tag in ('script', 'style'): self.raw = tag
+
+    def end(self, tag):
+        if not isinstance(tag, str): return
+        # every end tag separates text, as with HTMLParser's handle_endtag
+        self.page._end(tag)
+        if tag == self.raw: self.raw = None
+
+    def data(self, data):
+        self.page._data(data, self.raw)
+
+    def close(self):
+        pass
+
+class LxmlPageParser(_PageExtractor):
+    """PageParser on libxml2's HTML tokenizer (needs lxml); same feed()/close()
+    interface and results, several times faster on large pages."""
+
+    def __init__(self, base_url: str, scan_text: bool = False, images: Optional[ImageTable] = None):
+        from lxml import etree
+        self._setup(base_url, scan_text, images)
+        self._parser = etree.HTMLParser(target=_LxmlTarget(self), recover=True, no_network=True)
+        self._fed = False
+
+    def feed(self, data: str):
+        if data:
+            self._parser.feed(data)
+            self._fed = True
+
+    def close(self):
+        if self._fed: self._parser.close()
+        self._fed = False
+        self._finish()
+
+def page_parser(base_url: str, scan_text: bool = False, images: Optional[ImageTable] = None):
+    """A PageParser on the configured backend: lxml unless HTML_PARSER is
+    'html' or lxml is not installed."""
+    if HTML_PARSER != 'html' and lxml_available():
+        return LxmlPageParser(base_url, scan_text, images)
+    return PageParser(base_url, scan_text, images)
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/122 Safari/537.36',
@@ -144,89 +549,1233 @@ HEADERS = {
     'Accept-Language': 'en-US,en;q=0.9',
 }
 
-def fetch_bytes(url: str, timeout: int = 15) -> Optional[bytes]:
+# ═══════════════════════════════════════════════════════════════
+#  TIMING — wall/CPU time, bytes and counts per scan stage
+# ═══════════════════════════════════════════════════════════════
+
+TIMING_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PROFILE_TOP    = int(os.environ.get('CYBERSCOPE_PROFILE_TOP', '30'))
+
+class StageStats:
+    """Calls, wall seconds, CPU seconds (of the calling thread) and bytes per
+    stage name, plus a wall-time histogram over TIMING_BUCKETS if asked for."""
+
+    def __init__(self, histogram: bool = False):
+        self._stages = {}
+        self._histogram = histogram
+        self._lock = threading.Lock()
+
+    def add(self, name: str, wall: float, cpu: float, nbytes: int = 0):
+        with self._lock:
+            s = self._stages.get(name)
+            if s is None:
+                s = self._stages[name] = {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'bytes': 0}
+                if self._histogram: s['buckets'] = [0] * len(TIMING_BUCKETS)
+            s['count'] += 1
+            s['wall'] += wall
+            s['cpu'] += cpu
+            s['bytes'] += nbytes
+            if self._histogram:
+                i = bisect.bisect_left(TIMING_BUCKETS, wall)
+                if i < len(TIMING_BUCKETS): s['buckets'][i] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {k: dict(v, buckets=list(v.get('buckets', ()))) for k, v in self._stages.items()}
+
+    def summary(self) -> dict:
+        return {k: {'count': v['count'], 'wall_s': round(v['wall'], 4), 'cpu_s': round(v['cpu'], 4),
+                    'bytes': v['bytes']} for k, v in sorted(self.snapshot().items())}
+
+METRICS = StageStats(histogram=True)
+SCAN_TIMINGS = contextvars.ContextVar('scan_timings', default=None)
+
+@contextmanager
+def stage(name: str):
+    """Time the block into METRICS and the running scan's StageStats.
+    Yields a dict whose 'bytes' the block may set to the payload size."""
+    rec = {'bytes': 0}
+    w0, c0 = time.perf_counter(), time.thread_time()
     try:
-        req = urllib.request.Request(url, headers=HEADERS)
-        with urllib.request.urlopen(req, timeout=timeout) as r:
-            return r.read()
-    except: return None
-
-def fetch_image_pil(url: str) -> Optional[Image.Image]:
-    data = fetch_bytes(url)
-    if not data: return None
-    try: return Image.open(io.BytesIO(data)).convert('RGB')
-    except: return None
-
-def pil_to_b64(img: Image.Image, max_w: int = 200) -> str:
-    w, h = img.size
-    if w > max_w:
-        img = img.resize((max_w, int(h * max_w / w)), Image.LANCZOS)
-    buf = io.BytesIO()
-    img.save(buf, format='JPEG', quality=75)
-    return 'data:image/jpeg;base64,' + base64.b64encode(buf.getvalue()).decode()
-
-DOMAIN_RE = re.compile(
-    r'(?:https?://)?(?:www\.)?'
-    r'(?:[a-zA-Z0-9](?:[a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?\.)'
-    r'+(?:com\.tr|org\.tr|net\.tr|gov\.tr|edu\.tr|'
-    r'co\.uk|org\.uk|com\.au|co\.nz|co\.jp|com\.br|'
-    r'co\.in|com\.cn|co\.za|co\.kr|com\.my|'
-    r'com\.ar|com\.co|com\.mx|com\.sg|com\.hk|'
-    r'[a-zA-Z]{2,})'
-    r'(?:/[^\s,;\'\"<>()\[\]{}]*)?',
-    re.IGNORECASE
-)
-IMG_EXT_RE = re.compile(r'\.(png|jpg|jpeg|gif|webp|svg|ico|bmp|pdf|zip|js|css|html|xml|json)$', re.IGNORECASE)
-VALIDATE_RE = re.compile(
-    r'^(?:[a-zA-Z0-9](?:[a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?\.)'
-    r'+(?:com\.tr|org\.tr|net\.tr|gov\.tr|[a-zA-Z]{2,})$',
-    re.IGNORECASE
-)
-
-def extract_domains_from_text(text: str):
+        yield rec
+    finally:
+        wall, cpu = time.perf_counter() - w0, time.thread_time() - c0
+        METRICS.add(name, wall, cpu, rec['bytes'])
+        scan = SCAN_TIMINGS.get()
+        if scan is not None: scan.add(name, wall, cpu, rec['bytes'])
+
+def submit_ctx(pool, fn, *args):
+    """pool.submit() that carries the caller's scan timings and cancel token into the worker."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+# ═══════════════════════════════════════════════════════════════
+#  CANCEL — cooperative cancellation of running scans
+# ═══════════════════════════════════════════════════════════════
+
+CANCEL_GRACE = float(os.environ.get('CYBERSCOPE_CANCEL_GRACE', '10'))
+
+class ScanCancelled(Exception):
+    pass
+
+class CancelToken:
+    """Set once to stop a scan. Checked between stages, pages, images and
+    OCR passes and while waiting for fetch/OCR slots; a tesseract pass that
+    is already running finishes first."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = ''
+
+    def cancel(self, reason: str = 'cancelled'):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set(): raise ScanCancelled(self.reason)
+
+SCAN_CANCEL = contextvars.ContextVar('scan_cancel', default=None)
+
+def check_cancel():
+    """Raise ScanCancelled if the running scan has been cancelled."""
+    token = SCAN_CANCEL.get()
+    if token is not None: token.check()
+
+@contextmanager
+def hold(sem):
+    """Hold `sem`; a cancelled scan stops waiting for it."""
+    token = SCAN_CANCEL.get()
+    if token is None:
+        sem.acquire()
+    else:
+        while not sem.acquire(timeout=0.25):
+            token.check()
+    try:
+        yield
+    finally:
+        sem.release()
+
+# ═══════════════════════════════════════════════════════════════
+#  SHARED — one computation for concurrent scans doing the same work
+# ═══════════════════════════════════════════════════════════════
+
+SHARED_TTL     = float(os.environ.get('CYBERSCOPE_SHARED_TTL', '15'))
+SHARED_ENTRIES = 256
+
+class _Flight:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = self.error = None
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller runs `fn`; callers arriving while it runs wait for its
+    result instead of repeating the work, and for `ttl` seconds afterwards
+    get it from a small cache (None results are not kept). If the running
+    caller's scan is cancelled, one of the waiters takes over.
+    """
+
+    def __init__(self, name: str, ttl: float = SHARED_TTL, max_entries: int = SHARED_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._flights = {}
+        self._done = OrderedDict()              # key -> (expires, result)
+        self._lock = threading.Lock()
+        self.runs = self.shared = self.cached = 0
+
+    def do(self, key, fn):
+        while True:
+            with self._lock:
+                hit = self._done.get(key)
+                if hit is not None:
+                    if hit[0] > time.monotonic():
+                        self.cached += 1
+                        return hit[1]
+                    del self._done[key]
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    self.runs += 1
+                    break
+            token = SCAN_CANCEL.get()
+            while not flight.event.wait(0.25):
+                if token is not None: token.check()
+            if isinstance(flight.error, ScanCancelled): continue
+            if flight.error is not None: raise flight.error
+            with self._lock: self.shared += 1
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None and flight.result is not None and self.ttl > 0:
+                    self._done[key] = (time.monotonic() + self.ttl, flight.result)
+                    while len(self._done) > self.max_entries: self._done.popitem(last=False)
+            flight.event.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'runs': self.runs, 'shared': self.shared, 'cached': self.cached,
+                    'inflight': len(self._flights), 'entries': len(self._done)}
+
+PAGE_FLIGHT  = SingleFlight('page', max_entries=32)
+IMAGE_FLIGHT = SingleFlight('image', ttl=0)     # image bodies are large: share downloads, don't keep them
+OCR_FLIGHT   = SingleFlight('ocr')
+FLIGHTS = (PAGE_FLIGHT, IMAGE_FLIGHT, OCR_FLIGHT)
+
+FETCH_WORKERS  = int(os.environ.get('CYBERSCOPE_FETCH_WORKERS', '16'))
+FETCH_PER_HOST = int(os.environ.get('CYBERSCOPE_FETCH_PER_HOST', '4'))
+MAX_REDIRECTS  = 5
+
+# process-wide caps shared by every scan and job
+MAX_FETCHES = threading.BoundedSemaphore(int(os.environ.get('CYBERSCOPE_MAX_FETCHES', '32')))
+MAX_OCR     = threading.BoundedSemaphore(int(os.environ.get('CYBERSCOPE_MAX_OCR', '0')) or (os.cpu_count() or 2))
+MAX_DECODES = threading.BoundedSemaphore(int(os.environ.get('CYBERSCOPE_MAX_DECODES', '2')))
+
+class ConnectionPool:
+    """Keep-alive http.client connections, at most `per_host` in use per origin.
+
+    Proxies come from the environment (HTTP(S)_PROXY, NO_PROXY) or system
+    settings, as urllib reads them: http requests are sent to the proxy,
+    https ones tunnelled through it with CONNECT.
+    """
+
+    def __init__(self, per_host: int = FETCH_PER_HOST):
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+        self._proxies = None
+        self._routes = {}
+
+    def _proxy(self, scheme: str, host: str) -> Optional[tuple]:
+        """(host, port, headers) of the proxy for `scheme`://`host`; None to connect directly."""
+        with self._lock:
+            if (scheme, host) in self._routes: return self._routes[scheme, host]
+            if self._proxies is None: self._proxies = urllib_request.getproxies()
+            url = self._proxies.get(scheme)
+        route = None
+        if url and host and not urllib_request.proxy_bypass(host):
+            p = urlparse(url if '://' in url else 'http://' + url)
+            headers = {}
+            if p.username:
+                cred = f'{unquote(p.username)}:{unquote(p.password or "")}'
+                headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(cred.encode()).decode()
+            route = (p.hostname, p.port or 80, headers)
+        with self._lock:
+            self._routes[scheme, host] = route
+        return route
+
+    def _slot(self, key) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._slots.get(key)
+            if sem is None:
+                sem = self._slots[key] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+    def _checkout(self, key, timeout: int):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle: return idle.pop(), True
+        scheme, host, port = key
+        route = self._proxy(scheme, host)
+        if route is None:
+            cls = http_client.HTTPSConnection if scheme == 'https' else http_client.HTTPConnection
+            return cls(host, port, timeout=timeout), False
+        if scheme == 'https':
+            conn = http_client.HTTPSConnection(route[0], route[1], timeout=timeout)
+            conn.set_tunnel(host, port, headers=route[2])
+            return conn, False
+        return http_client.HTTPConnection(route[0], route[1], timeout=timeout), False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.per_host:
+                idle.append(conn); return
+        conn.close()
+
+    def _send(self, key, path: str, timeout: int, headers: Optional[dict] = None):
+        for attempt in range(2):
+            conn, reused = self._checkout(key, timeout)
+            try:
+                conn.request('GET', path, headers={**HEADERS, **headers} if headers else HEADERS)
+                return conn, conn.getresponse()
+            except (http_client.HTTPException, OSError):
+                conn.close()
+                # an idle keep-alive socket may have been dropped by the server
+                if reused and attempt == 0: continue
+                raise
+
+    def _release(self, key, conn, r):
+        # only a fully read response leaves the connection reusable
+        if r.isclosed() and not r.will_close: self._checkin(key, conn)
+        else: conn.close()
+
+    @contextmanager
+    def open(self, url: str, timeout: int = 15, headers: Optional[dict] = None):
+        """GET `url`, following redirects; yields the final response with its
+        body unread so callers can stream it. Holds the host slot until exit."""
+        for _ in range(MAX_REDIRECTS + 1):
+            p = urlparse(url)
+            key = (p.scheme, p.hostname, p.port or (443 if p.scheme == 'https' else 80))
+            path = p.path or '/'
+            if p.query: path += '?' + p.query
+            send_headers = headers
+            route = self._proxy(p.scheme, p.hostname)
+            if route and p.scheme == 'http':
+                path = f'http://{p.netloc.rpartition("@")[2]}{path}'   # absolute-form for the proxy
+                send_headers = {**route[2], **(headers or {})}
+            with hold(self._slot(key)), hold(MAX_FETCHES):
+                conn, r = self._send(key, path, timeout, send_headers)
+                try:
+                    if r.status in (301, 302, 303, 307, 308) and r.getheader('Location'):
+                        r.read()
+                        url = urljoin(url, r.getheader('Location'))
+                        continue
+                    yield r
+                    return
+                finally:
+                    self._release(key, conn, r)
+        raise http_client.HTTPException(f'too many redirects: {url}')
+
+    def request(self, url: str, timeout: int = 15, headers: Optional[dict] = None):
+        """GET `url`; returns (status, headers, body) or raises."""
+        with self.open(url, timeout, headers) as r:
+            return r.status, r.headers, read_capped(r)
+
+HTTP_POOL = ConnectionPool()
+
+IMAGE_MAX_BYTES  = int(os.environ.get('CYBERSCOPE_IMAGE_MAX_MB', '20')) * 1024 * 1024
+IMAGE_MAX_PIXELS = int(os.environ.get('CYBERSCOPE_IMAGE_MAX_PIXELS', str(40_000_000)))
+IMAGE_MAX_SIDE   = int(os.environ.get('CYBERSCOPE_IMAGE_MAX_SIDE', '2400'))
+
+def read_capped(r, max_bytes: Optional[int] = None) -> Optional[bytes]:
+    """Read a response body in chunks, giving up (None) as soon as it exceeds
+    `max_bytes`. A cancelled scan stops between chunks."""
+    length = r.headers.get('Content-Length', '')
+    if max_bytes and length.isdigit() and int(length) > max_bytes: return None
+    buf = bytearray()
+    while True:
+        check_cancel()
+        chunk = r.read1(64 * 1024)
+        if not chunk: return bytes(buf)
+        buf += chunk
+        if max_bytes and len(buf) > max_bytes: return None
+
+def fetch_bytes(url: str, timeout: int = 15, max_bytes: Optional[int] = None) -> Optional[bytes]:
+    with stage('fetch') as st:
+        if url.startswith('http://') or url.startswith('https://'):
+            try:
+                with HTTP_POOL.open(url, timeout=timeout) as r:
+                    body = read_capped(r, max_bytes) if r.status < 400 else None
+            except ScanCancelled: raise
+            except: return None
+        else:
+            try:
+                req = urllib_request.Request(url, headers=HEADERS)
+                with urllib_request.urlopen(req, timeout=timeout) as r:
+                    body = read_capped(r, max_bytes)
+            except: return None
+        st['bytes'] = len(body or b'')
+        return body
+
+def fetch_page(url: str, timeout: int = 15) -> Optional[str]:
+    """Fetch an HTML document through the pool; None for errors and non-HTML bodies."""
+    with stage('fetch') as st:
+        try:
+            status, headers, body = HTTP_POOL.request(url, timeout=timeout)
+        except ScanCancelled: raise
+        except: return None
+        st['bytes'] = len(body)
+    ctype = headers.get('Content-Type', '')
+    if status >= 400 or (ctype and 'html' not in ctype): return None
+    return body.decode(headers.get_content_charset() or 'utf-8', errors='replace')
+
+def shared_page(url: str) -> Optional[str]:
+    """fetch_page() coalesced with concurrent scans fetching the same URL."""
+    return PAGE_FLIGHT.do(('page', url), lambda: fetch_page(url))
+
+def decode_image(data: bytes, max_side: int = IMAGE_MAX_SIDE) -> Optional[Image.Image]:
+    """Decode to one RGB buffer whose long side is at most `max_side`.
+
+    Images over IMAGE_MAX_PIXELS are refused from the header alone. Large
+    JPEGs are DCT-scaled while decoding (draft mode) and other formats are
+    shrunk with reduce(), so full-size pixels are never converted or copied.
+    Images over `max_side` are decoded at most MAX_DECODES at a time across
+    all scans, since those briefly hold their full-size pixels.
+    """
+    with stage('decode') as st:
+        st['bytes'] = len(data)
+        try:
+            img = Image.open(io.BytesIO(data))
+            w, h = img.size
+            if w * h > IMAGE_MAX_PIXELS: return None
+            long_side = max(w, h)
+            if long_side <= max_side:
+                img.load()
+            else:
+                with hold(MAX_DECODES):
+                    if img.format == 'JPEG':
+                        img.draft('RGB', (w * max_side // long_side, h * max_side // long_side))
+                    img.load()
+                    factor = max(img.size) // max_side
+                    if factor >= 2: img = img.reduce(factor)
+                    if img.mode != 'RGB': img = img.convert('RGB')
+                    if max(img.size) > max_side: img.thumbnail((max_side, max_side), Image.LANCZOS)
+            if img.mode != 'RGB': img = img.convert('RGB')
+            return img
+        except ScanCancelled: raise
+        except: return None
+
+def pil_to_jpeg(img: Image.Image, max_w: int = 200) -> bytes:
+    with stage('thumbnail') as st:
+        w, h = img.size
+        if w > max_w:
+            img = img.resize((max_w, int(h * max_w / w)), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=75)
+        st['bytes'] = buf.tell()
+        return buf.getvalue()
+
+THUMB_WORKERS   = int(os.environ.get('CYBERSCOPE_THUMB_WORKERS', '2'))
+THUMB_CACHE_BYTES = int(os.environ.get('CYBERSCOPE_THUMB_CACHE_MB', '16')) * 1024 * 1024
+
+class ThumbnailService:
+    """JPEG previews rendered on their own small pool and kept in a
+    size-bounded LRU keyed by the image's content hash.
+
+    submit() returns the /thumb URL at once; the route waits for the render
+    only if the browser asks before it has finished.
+    """
+
+    def __init__(self, workers: int = THUMB_WORKERS, max_bytes: int = THUMB_CACHE_BYTES):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='thumb')
+        self._lru = OrderedDict()
+        self._pending = {}
+        self._size = 0
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def url(digest: str) -> str:
+        return f'/thumb/{digest}.jpg'
+
+    def has(self, digest: str) -> bool:
+        with self._lock:
+            return digest in self._lru or digest in self._pending
+
+    def submit(self, digest: str, img: Image.Image) -> str:
+        with self._lock:
+            if digest not in self._lru and digest not in self._pending:
+                self._pending[digest] = submit_ctx(self._pool, self._render, digest, img)
+        return self.url(digest)
+
+    def _render(self, digest: str, img: Image.Image) -> Optional[bytes]:
+        try:
+            data = pil_to_jpeg(img)
+        except Exception:
+            data = None
+        with self._lock:
+            self._pending.pop(digest, None)
+            if data:
+                self._lru[digest] = data
+                self._size += len(data)
+                while self._size > self.max_bytes and len(self._lru) > 1:
+                    self._size -= len(self._lru.popitem(last=False)[1])
+        return data
+
+    def get(self, digest: str, timeout: float = 10) -> Optional[bytes]:
+        with self._lock:
+            data = self._lru.get(digest)
+            if data is not None:
+                self._lru.move_to_end(digest)
+                return data
+            fut = self._pending.get(digest)
+        if fut is None: return None
+        try: return fut.result(timeout)
+        except Exception: return None
+
+THUMBS = ThumbnailService()
+
+EXTRACT_VERSION = 2                     # part of OCR cache keys; bump when extraction changes
+
+# suffixes OCR often splits ("example . com") or misreads ("example,com"); in
+# OCR text a ',' or spaced '.' joins labels when one of these follows
+COMMON_TLDS = ('com', 'net', 'org', 'edu', 'gov', 'info', 'biz', 'io', 'co', 'uk', 'tr')
+FILE_EXTS = frozenset(('png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'bmp', 'pdf', 'zip',
+                       'js', 'css', 'html', 'htm', 'xml', 'json', 'php', 'txt', 'mov', 'mp4'))
+_LABEL = r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?'
+_JOIN  = rf'(?:\.|[ ]?[.,][ ]?(?=(?:{"|".join(COMMON_TLDS)})(?![a-z0-9-])))'
+
+def _domain_re(join: str, www: str) -> re.Pattern:
+    return re.compile(
+        rf'(?<![a-z0-9-])(?P<scheme>https?://)?(?P<www>www{www})?'
+        rf'(?P<host>{_LABEL}(?:{join}{_LABEL})+)'
+        r'(?P<path>/[^\s,;\'"<>()\[\]{}]*)?',
+        re.IGNORECASE
+    )
+
+# page text and scripts are prose and code: "revenue, net of" is not a domain
+DOMAIN_RE     = _domain_re(r'\.', r'\.')
+OCR_DOMAIN_RE = _domain_re(_JOIN, r'[ ]?[.,][ ]?')
+_SEP_RE     = re.compile(r'\.')
+_OCR_SEP_RE = re.compile(r'[.,]')
+_LABEL_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-')
+
+def _domain_matches(text: str, ocr: bool = False):
+    """DOMAIN_RE (OCR_DOMAIN_RE with `ocr`) matches, attempted only at the word
+    before each separator instead of at every position in `text`."""
+    pattern = OCR_DOMAIN_RE if ocr else DOMAIN_RE
+    end = 0
+    for sep in (_OCR_SEP_RE if ocr else _SEP_RE).finditer(text):
+        p = sep.start()
+        if p < end: continue
+        s = p - 1 if p and text[p - 1] == ' ' else p
+        while s and text[s - 1] in _LABEL_CHARS: s -= 1
+        head = text[max(0, s - 8):s].lower()
+        if head.endswith('https://'): s -= 8
+        elif head.endswith('http://'): s -= 7
+        m = pattern.match(text, s)
+        if m:
+            end = m.end()
+            yield m
+
+def _valid_host(host: str) -> bool:
+    if not 4 <= len(host) <= 253: return False
+    labels = host.split('.')
+    tld = labels[-1]
+    if tld in FILE_EXTS or not tld.isalpha(): return False
+    index = PSL_INDEX or psl_index()
+    if index.complete and not index.listed(tld): return False
+    return len(labels) > index.suffix_labels(labels)
+
+def extract_domains_from_text(text: str, strict: bool = False, ocr: bool = False) -> list:
+    """[{'host', 'raw'}, …] for each distinct domain in `text`, in order.
+
+    Hosts come back lower-case without scheme or "www.", and only if their
+    top-level label is on the suffix list. With `ocr`, OCR slips such as
+    "example,com" or "example . com" are joined for the COMMON_TLDS. With
+    `strict` (for script source), a bare name also needs one of those
+    suffixes, so property chains like `this.style` are not taken for domains.
+    """
     found = {}
-    for m in DOMAIN_RE.finditer(text):
-        raw = m.group(0).strip()
-        host = re.sub(r'^https?://', '', raw, flags=re.IGNORECASE)
-        host = re.sub(r'^www\.', '', host, flags=re.IGNORECASE)
-        host = host.split('/')[0].split('?')[0].rstrip('.,;:!?\'"')
-        if len(host) > 253 or len(host) < 4: continue
-        if IMG_EXT_RE.search(host): continue
-        if host not in found:
-            found[host] = raw
+    checked = {}
+    for m in _domain_matches(text, ocr):
+        host = m.group('host')
+        if ' ' in host or ',' in host: host = host.replace(' ', '').replace(',', '.')
+        host = host.lower()
+        if host in found: continue
+        ok = checked.get(host)
+        if ok is None: ok = checked[host] = _valid_host(host)
+        if not ok: continue
+        if strict and not (m.group('scheme') or m.group('www')) and host.rsplit('.', 1)[-1] not in COMMON_TLDS:
+            continue
+        found[host] = m.group(0)
     return [{'host': h, 'raw': r} for h, r in found.items()]
 
-def do_ocr(img: Image.Image) -> str:
+# tesseract runs as a subprocess per pass, so plain threads keep every core busy
+OCR_WORKERS = int(os.environ.get('CYBERSCOPE_OCR_WORKERS', '0')) or min(8, os.cpu_count() or 2)
+OCR_MAX_WORKERS = 32
+
+def load_image_bytes(url: str, target: str) -> Optional[bytes]:
+    """Raw bytes of an OCR candidate, preferring files next to a local HTML target."""
+    if url.startswith('https://x.invalid/') or url.startswith('file://'):
+        rel = url.replace('https://x.invalid/','').replace('file://','')
+        for cand in [
+            os.path.join(os.path.dirname(os.path.abspath(target)), rel),
+            rel, os.path.join(os.getcwd(), rel)
+        ]:
+            if os.path.exists(cand):
+                try:
+                    if os.path.getsize(cand) > IMAGE_MAX_BYTES: return None
+                    return Path(cand).read_bytes()
+                except: pass
+    return IMAGE_FLIGHT.do(url, lambda: fetch_bytes(url, max_bytes=IMAGE_MAX_BYTES))
+
+OCR_CACHE_ENTRIES = int(os.environ.get('CYBERSCOPE_OCR_CACHE_ENTRIES', '2048'))
+OCR_CACHE_BYTES   = int(os.environ.get('CYBERSCOPE_OCR_CACHE_MB', '32')) * 1024 * 1024
+CACHE_DIR         = os.environ.get('CYBERSCOPE_CACHE_DIR', '')
+
+class OCRCache:
+    """OCR text + extracted domains keyed by a hash of the image bytes.
+
+    An in-memory LRU bounded by entry count and approximate size sits in front
+    of an optional SQLite file under `cache_dir`, so results survive restarts.
+    """
+
+    def __init__(self, max_entries: int = OCR_CACHE_ENTRIES,
+                 max_bytes: int = OCR_CACHE_BYTES, cache_dir: str = CACHE_DIR):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lru = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+        self._db = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(cache_dir, 'ocr_cache.sqlite3'),
+                                       check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS ocr '
+                             '(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)')
+            self._db.commit()
+
+    @staticmethod
+    def key(data: bytes, variant: str = '') -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        return f'{digest}:{variant}' if variant else digest
+
+    def _remember(self, key: str, value: str):
+        if key in self._lru:
+            self._size -= len(self._lru.pop(key))
+        self._lru[key] = value
+        self._size += len(value)
+        while self._lru and (len(self._lru) > self.max_entries or self._size > self.max_bytes):
+            self._size -= len(self._lru.popitem(last=False)[1])
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return json.loads(value)
+            if self._db is not None:
+                row = self._db.execute('SELECT value FROM ocr WHERE key = ?', (key,)).fetchone()
+                if row:
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, key: str, text: str, domains: list):
+        value = json.dumps({'text': text, 'domains': domains})
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO ocr VALUES (?, ?, ?)', (key, value, time.time()))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._lru), 'bytes': self._size, 'hits': self.hits,
+                    'disk_hits': self.disk_hits, 'misses': self.misses}
+
+OCR_CACHE = OCRCache()
+
+OCR_PSMS  = (6, 11, 3)
+OCR_MODES = ('exhaustive', 'early', 'adaptive', 'data')
+OCR_MODE  = os.environ.get('CYBERSCOPE_OCR_MODE', 'exhaustive')
+
+def _ocr_input(img: Image.Image) -> Image.Image:
     w, h = img.size
     if w < 800:
         scale = max(2, 800 // w)
         img = img.resize((w * scale, h * scale), Image.LANCZOS)
+    return img
+
+def _tesseract(img: Image.Image, psm: int, errors: Optional[list] = None) -> str:
+    try:
+        with hold(MAX_OCR), stage(f'tesseract_psm{psm}'):
+            return pytesseract.image_to_string(img, lang='eng', config=f'--oem 3 --psm {psm}')
+    except ScanCancelled: raise
+    except Exception as e:
+        if errors is not None: errors.append(f'psm {psm}: {e}')
+        return ''
+
+def pick_psms(img: Image.Image) -> tuple:
+    """PSM order for `img`, best guess first, from its shape and edge density."""
+    w, h = img.size
+    if h and w / h >= 4 and h <= 150:
+        return (7, 6, 11)                       # banner / single line of text
+    small = img.convert('L')
+    small.thumbnail((256, 256))
+    density = ImageStat.Stat(small.filter(ImageFilter.FIND_EDGES)).mean[0] / 255
+    if density < 0.04:
+        return (11, 6, 3)                       # mostly empty, scattered words
+    return (6, 11, 3)
+
+def _ocr_data(img: Image.Image, errors: Optional[list] = None) -> str:
+    """One image_to_data pass; word boxes are regrouped into their text lines."""
+    try:
+        with hold(MAX_OCR), stage('tesseract_data'):
+            d = pytesseract.image_to_data(img, lang='eng', config='--oem 3 --psm 11',
+                                          output_type=pytesseract.Output.DICT)
+    except ScanCancelled: raise
+    except Exception as e:
+        if errors is not None: errors.append(f'data: {e}')
+        return ''
+    lines = {}
+    for i, word in enumerate(d['text']):
+        if not word.strip() or float(d['conf'][i]) < 0: continue
+        key = (d['block_num'][i], d['par_num'][i], d['line_num'][i])
+        lines.setdefault(key, []).append((d['left'][i], word))
+    return '\n'.join(' '.join(w for _, w in sorted(words)) for _, words in sorted(lines.items()))
+
+def ocr_image(img: Image.Image, mode: str = 'exhaustive', errors: Optional[list] = None) -> tuple:
+    """OCR `img` with the given strategy; returns (text, tesseract passes run).
+    A failed pass counts as empty text and is described in `errors`, if given.
+
+    exhaustive  psm 6, 11 and 3, longest output wins (original behaviour)
+    early       same order, stop at the first pass that yields a domain
+    adaptive    order picked by pick_psms(), stop at the first domain
+    data        a single image_to_data pass
+    """
+    if mode not in OCR_MODES: mode = 'exhaustive'
+    psms = pick_psms(img) if mode == 'adaptive' else OCR_PSMS
+    img = _ocr_input(img)
+    if mode == 'data':
+        return _ocr_data(img, errors), 1
     best = ''
-    for psm in (6, 11, 3):
+    passes = 0
+    for psm in psms:
+        check_cancel()
+        text = _tesseract(img, psm, errors)
+        passes += 1
+        if len(text) > len(best): best = text
+        if mode != 'exhaustive' and extract_domains_from_text(text, ocr=True):
+            return text, passes
+    return best, passes
+
+def do_ocr(img: Image.Image, mode: str = 'exhaustive') -> str:
+    return ocr_image(img, mode)[0]
+
+OCR_BUDGET     = int(os.environ.get('CYBERSCOPE_OCR_BUDGET', '30'))
+OCR_CANDIDATES = int(os.environ.get('CYBERSCOPE_OCR_CANDIDATES', '90'))
+OCR_MIN_SCORE  = float(os.environ.get('CYBERSCOPE_OCR_MIN_SCORE', '0.15'))
+
+def text_score(img: Image.Image) -> tuple:
+    """Cheap 0..1 likelihood that `img` carries readable text, plus the features.
+
+    Uses PIL's C-level histogram/filter/stat ops on a 256 px preview. `ink` is
+    the share of pixels on a sharp edge: zero for blanks and smooth gradients,
+    a few percent for glyphs (even a lone line of text on a plain background),
+    and most of the image for noise and busy photos, which a wide tonal spread
+    (entropy) also gives away. Icons, spacers and tracking pixels are too small.
+    """
+    w, h = img.size
+    feats = {'w': w, 'h': h}
+    if w * h < 32 * 32 or min(w, h) < 12:
+        return 0.0, dict(feats, reason='tiny')
+    aspect = max(w / h, h / w)
+    small = img.convert('L')
+    small.thumbnail((256, 256))
+    edges = small.filter(ImageFilter.FIND_EDGES)
+    edges = edges.crop((1, 1, edges.width - 1, edges.height - 1))   # the filter smears the border
+    ehist = edges.histogram()
+    ink = sum(ehist[48:]) / max(1, sum(ehist))
+    hist = small.histogram()
+    n = float(sum(hist))
+    entropy = -sum(c / n * math.log2(c / n) for c in hist if c)
+    feats.update(aspect=round(aspect, 2), ink=round(ink, 4), entropy=round(entropy, 3))
+    if ink < 0.0005:
+        return 0.0, dict(feats, reason='blank')
+    edge_c = min(1.0, math.log10(ink / 0.0005) / math.log10(0.02 / 0.0005))
+    busy_c = 1.0 if ink <= 0.10 else max(0.1, 1.0 - (ink - 0.10) * 4)
+    ent_c  = 1.0 if entropy <= 6.0 else max(0.3, 1.0 - (entropy - 6.0) * 0.35)
+    size_c = min(1.0, math.sqrt(w * h) / 200)
+    asp_c  = 1.0 if aspect <= 16 else 0.5
+    return round(edge_c * busy_c * ent_c * size_c * asp_c, 4), feats
+
+# ═══════════════════════════════════════════════════════════════
+#  STREAM — parse the target page while it downloads
+# ═══════════════════════════════════════════════════════════════
+
+STREAM_CHUNK = 64 * 1024
+
+def iter_html(target: str, chunk_size: int = STREAM_CHUNK):
+    """Yield decoded text chunks of a URL or local file as they are read."""
+    if target.startswith('http://') or target.startswith('https://'):
+        with HTTP_POOL.open(target) as r:
+            if r.status >= 400:
+                raise http_client.HTTPException(f'HTTP {r.status}')
+            charset = r.headers.get_content_charset() or 'utf-8'
+            try: dec = codecs.getincrementaldecoder(charset)(errors='replace')
+            except LookupError: dec = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            while True:
+                data = r.read1(chunk_size)
+                if not data: break
+                text = dec.decode(data)
+                if text: yield text
+            tail = dec.decode(b'', final=True)
+            if tail: yield tail
+    else:
+        with open(target, encoding='utf-8', errors='replace') as f:
+            while True:
+                text = f.read(chunk_size)
+                if not text: break
+                yield text
+
+def stream_parse(target: str, base_url: str, t_host: str, t_base: str, emit, scan_text: bool = False):
+    """Feed `target` to PageParser chunk by chunk, emitting each new host and
+    image as soon as it is seen. Returns (images, domain_map, chars read), or
+    None if nothing could be read."""
+    parser = page_parser(base_url, scan_text)
+    domain_map = {}
+    if t_host:
+        domain_map[t_host] = 'PRIMARY'
+        emit('domain', host=t_host, cls='PRIMARY')
+    n_hosts, n_imgs, size = 1, 0, 0
+
+    def flush():
+        nonlocal n_hosts, n_imgs
+        with stage('classify'):
+            new = [(h, classify(h, t_base)) for h in sorted(parser.hosts.names[n_hosts:]) if h not in domain_map]
+        n_hosts = len(parser.hosts.names)
+        for h, cls in new:
+            domain_map[h] = cls
+            emit('domain', host=h, cls=cls)
+        for url, alt, host, extra in parser.images.rows(n_imgs):
+            emit('image', url=url, alt=alt, host=host, extra=extra,
+                 is_external=(host != '' and base_domain(host) != t_base))
+        n_imgs = len(parser.images)
+
+    try:
+        for chunk in iter_html(target):
+            check_cancel()
+            size += len(chunk)
+            with stage('parse') as st:
+                st['bytes'] = len(chunk)
+                parser.feed(chunk)
+            flush()
+    except ScanCancelled:
+        raise
+    except Exception as e:
+        if not size: return None
+        emit('log', level='warn', msg=f'Download interrupted after {size//1024} KB: {e}')
+    parser.close()
+    flush()
+    return parser.images, domain_map, size
+
+# ═══════════════════════════════════════════════════════════════
+#  CRAWL — follows same-site links from the target page
+# ═══════════════════════════════════════════════════════════════
+
+CRAWL_MAX_PAGES    = int(os.environ.get('CYBERSCOPE_CRAWL_PAGES', '50'))
+CRAWL_MAX_DEPTH    = 5
+CRAWL_MAX_FRONTIER = int(os.environ.get('CYBERSCOPE_CRAWL_FRONTIER', '5000'))
+SKIP_LINK_RE = re.compile(r'\.(png|jpe?g|gif|webp|svg|ico|bmp|pdf|zip|gz|rar|7z|mp[34]|avi|mov|webm|'
+                          r'woff2?|ttf|eot|js|css|json|xml|rss|exe|dmg|apk)$', re.IGNORECASE)
+
+def _crawl_key(url: str) -> str:
+    return url.split('#', 1)[0]
+
+def crawl_site(start_url: str, start_html: str, t_host: str, t_base: str, emit,
+               depth: int = 1, max_pages: int = CRAWL_MAX_PAGES, scan_text: bool = False):
+    """Breadth-first crawl of pages sharing the target's base domain.
+
+    Pages are fetched concurrently on the shared connection pool; every new
+    host and image is classified and emitted as soon as its page is parsed.
+    Returns (images, domain_map) merged across all pages.
+    """
+    depth = max(0, min(depth, CRAWL_MAX_DEPTH))
+    max_pages = max(1, max_pages)
+    images, domain_map = ImageTable(), {}
+    seen_urls = {_crawl_key(start_url)}
+    frontier = deque()
+    pages = dropped = 0
+    n_hosts = 1
+    t0 = time.monotonic()
+
+    if t_host:
+        domain_map[t_host] = 'PRIMARY'
+        emit('domain', host=t_host, cls='PRIMARY')
+
+    def absorb(url: str, html: str, d: int):
+        nonlocal dropped, n_hosts
+        n_imgs = len(images)
+        parser = page_parser(url, scan_text, images)
+        with stage('parse') as st:
+            st['bytes'] = len(html)
+            try: parser.feed(html); parser.close()
+            except Exception as e:
+                emit('log', level='warn', msg=f'  Parse error on {url}: {e}')
+        with stage('classify'):
+            new = [(h, classify(h, t_base)) for h in sorted(images.hosts.names[n_hosts:]) if h not in domain_map]
+        n_hosts = len(images.hosts.names)
+        for h, cls in new:
+            domain_map[h] = cls
+            emit('domain', host=h, cls=cls)
+        for img_url, alt, host, extra in images.rows(n_imgs):
+            emit('image', url=img_url, alt=alt, host=host, extra=extra,
+                 is_external=(host != '' and base_domain(host) != t_base),
+                 page=url)
+        if d >= depth: return
+        for link in parser.links:
+            key = _crawl_key(link)
+            if key in seen_urls or not key.startswith(('http://', 'https://')): continue
+            p = urlparse(key)
+            if not p.hostname or base_domain(p.hostname) != t_base or SKIP_LINK_RE.search(p.path):
+                continue
+            seen_urls.add(key)
+            if len(frontier) >= CRAWL_MAX_FRONTIER:
+                dropped += 1; continue
+            frontier.append((key, d + 1))
+
+    def progress(inflight: int):
+        elapsed = time.monotonic() - t0
+        emit('crawl_progress', pages=pages, max_pages=max_pages, frontier=len(frontier),
+             inflight=inflight, pages_per_sec=round(pages / elapsed, 2) if elapsed > 0 else 0.0)
+
+    absorb(start_url, start_html, 0)
+    pages = 1
+    progress(0)
+
+    workers = max(1, min(FETCH_WORKERS, max_pages))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crawl') as pool:
+        inflight = {}
+        while frontier or inflight:
+            check_cancel()
+            while frontier and len(inflight) < workers and pages + len(inflight) < max_pages:
+                url, d = frontier.popleft()
+                inflight[submit_ctx(pool, shared_page, url)] = (url, d)
+            if not inflight: break
+            done, _ = wait(inflight, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                url, d = inflight.pop(fut)
+                pages += 1
+                html = fut.result()
+                if html is None:
+                    emit('log', level='warn', msg=f'  Could not fetch page: {url}')
+                else:
+                    emit('log', level='info', msg=f'  Crawled [{pages}/{max_pages}] {url}')
+                    absorb(url, html, d)
+                progress(len(inflight))
+
+    elapsed = time.monotonic() - t0
+    emit('log', level='ok', msg=f'Crawl finished — {pages} page(s) in {elapsed:.1f}s, '
+                                f'{len(frontier)} URL(s) left in frontier'
+                                + (f', {dropped} dropped (frontier full)' if dropped else '') + '.')
+    return images, domain_map
+
+# ═══════════════════════════════════════════════════════════════
+#  STORE — scan history, HTTP validators and diffs between scans
+# ═══════════════════════════════════════════════════════════════
+
+STORE_PATH = os.environ.get('CYBERSCOPE_STORE') or (
+    os.path.join(CACHE_DIR, 'results.sqlite3') if CACHE_DIR else '')
+
+class ResultStore:
+    """SQLite history of scans: domains, images and OCR hits per target and
+    time, plus ETag/Last-Modified/content hash per fetched URL so re-scans
+    can skip pages and images that have not changed."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS scans (
+        id INTEGER PRIMARY KEY, target TEXT NOT NULL, started REAL NOT NULL, finished REAL,
+        options TEXT, content_hash TEXT);
+    CREATE INDEX IF NOT EXISTS scans_target ON scans (target, started);
+    CREATE TABLE IF NOT EXISTS scan_domains (
+        scan_id INTEGER NOT NULL, host TEXT NOT NULL, cls TEXT NOT NULL, PRIMARY KEY (scan_id, host));
+    CREATE TABLE IF NOT EXISTS scan_images (
+        scan_id INTEGER NOT NULL, url TEXT NOT NULL, host TEXT, alt TEXT, extra TEXT,
+        PRIMARY KEY (scan_id, url));
+    CREATE TABLE IF NOT EXISTS scan_ocr (
+        scan_id INTEGER NOT NULL, image_url TEXT NOT NULL, host TEXT, raw TEXT);
+    CREATE INDEX IF NOT EXISTS scan_ocr_image ON scan_ocr (scan_id, image_url);
+    CREATE INDEX IF NOT EXISTS scan_ocr_host ON scan_ocr (host);
+    CREATE TABLE IF NOT EXISTS validators (
+        url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, fetched REAL);
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(self.SCHEMA)
+            for col in ('options', 'content_hash'):        # stores created before these columns
+                try: self._db.execute(f'ALTER TABLE scans ADD COLUMN {col} TEXT')
+                except sqlite3.OperationalError: pass
+
+    def _query(self, sql: str, args: tuple = ()) -> list:
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    # ── validators ──
+    def conditional_headers(self, url: str) -> dict:
+        row = self._query('SELECT etag, last_modified FROM validators WHERE url = ?', (url,))
+        if not row: return {}
+        etag, lm = row[0]
+        h = {}
+        if etag: h['If-None-Match'] = etag
+        if lm: h['If-Modified-Since'] = lm
+        return h
+
+    def content_hash(self, url: str) -> Optional[str]:
+        row = self._query('SELECT content_hash FROM validators WHERE url = ?', (url,))
+        return row[0][0] if row else None
+
+    def save_validators(self, url: str, etag: Optional[str], last_modified: Optional[str], digest: str):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?, ?)',
+                             (url, etag, last_modified, digest, time.time()))
+            self._db.commit()
+
+    # ── scans ──
+    def last_scan(self, target: str, options: str) -> Optional[tuple]:
+        """(id, started, content_hash) of the newest finished scan of `target` run with `options`."""
+        row = self._query('SELECT id, started, content_hash FROM scans WHERE target = ? AND options = ? '
+                          'AND finished IS NOT NULL ORDER BY started DESC LIMIT 1', (target, options))
+        return row[0] if row else None
+
+    def scans(self, target: str, limit: int = 50) -> list:
+        return [{'id': i, 'started': st, 'finished': fin, 'domains': nd} for i, st, fin, nd in self._query(
+            'SELECT s.id, s.started, s.finished, (SELECT COUNT(*) FROM scan_domains d WHERE d.scan_id = s.id) '
+            'FROM scans s WHERE s.target = ? ORDER BY s.started DESC LIMIT ?', (target, limit))]
+
+    def scan_results(self, scan_id: int) -> tuple:
+        """(images, domain_map) recorded for `scan_id`."""
+        domain_map = dict(self._query('SELECT host, cls FROM scan_domains WHERE scan_id = ?', (scan_id,)))
+        images = ImageTable()
+        for u, h, a, e in self._query('SELECT url, host, alt, extra FROM scan_images '
+                                      'WHERE scan_id = ? ORDER BY rowid', (scan_id,)):
+            images.add(u, a or '', h or '', e or '')
+        return images, domain_map
+
+    def image_ocr(self, scan_id: int, image_url: str) -> Optional[list]:
+        """Domains OCR'd from `image_url` in `scan_id`; None if it was not OCR'd then."""
+        rows = self._query('SELECT host, raw FROM scan_ocr WHERE scan_id = ? AND image_url = ?',
+                           (scan_id, image_url))
+        if not rows: return None
+        return [{'host': h, 'raw': r} for h, r in rows if h]
+
+    def record_scan(self, target: str, started: float, domain_map: dict, images: ImageTable,
+                    ocr_hits: list, options: str = '', content_hash: Optional[str] = None) -> int:
+        """Store a finished scan; `ocr_hits` is [(image_url, [{'host','raw'}, …]), …],
+        `content_hash` the hash of the target page this scan parsed, if known."""
+        with self._lock:
+            cur = self._db.execute('INSERT INTO scans (target, started, finished, options, content_hash) '
+                                   'VALUES (?, ?, ?, ?, ?)', (target, started, time.time(), options, content_hash))
+            sid = cur.lastrowid
+            self._db.executemany('INSERT OR IGNORE INTO scan_domains VALUES (?, ?, ?)',
+                                 ((sid, h, c) for h, c in domain_map.items()))
+            self._db.executemany('INSERT OR IGNORE INTO scan_images VALUES (?, ?, ?, ?, ?)',
+                                 ((sid, u, h, a, e) for u, a, h, e in images.rows()))
+            # a NULL host row marks an image that was OCR'd without finding anything
+            self._db.executemany('INSERT INTO scan_ocr VALUES (?, ?, ?, ?)',
+                                 ((sid, url, d['host'], d['raw']) for url, found in ocr_hits
+                                  for d in (found or [{'host': None, 'raw': None}])))
+            self._db.commit()
+            return sid
+
+    def diff(self, old_id: int, new_id: int) -> dict:
+        """Domains (page and OCR) added and removed between two scans."""
+        q = ('SELECT host FROM {t} WHERE scan_id = ? {nn} EXCEPT SELECT host FROM {t} WHERE scan_id = ?')
+        out = {}
+        for name, table, nn in (('domains', 'scan_domains', ''), ('ocr', 'scan_ocr', 'AND host IS NOT NULL')):
+            sql = q.format(t=table, nn=nn)
+            out[name] = {'added':   sorted(h for (h,) in self._query(sql, (new_id, old_id))),
+                         'removed': sorted(h for (h,) in self._query(sql, (old_id, new_id)))}
+        return out
+
+RESULT_STORE = ResultStore(STORE_PATH) if STORE_PATH else None
+
+def fetch_revalidate(url: str, store: ResultStore, max_bytes: Optional[int] = None) -> tuple:
+    """Conditional GET against the stored validators.
+
+    Returns (body, unchanged): body is None on a 304 or an error; unchanged is
+    True for a 304 or a body whose hash matches the last fetch.
+    """
+    with stage('fetch') as st:
         try:
-            text = pytesseract.image_to_string(img, lang='eng', config=f'--oem 3 --psm {psm}')
-            if len(text) > len(best): best = text
-        except: pass
-    return best
+            with HTTP_POOL.open(url, headers=store.conditional_headers(url)) as r:
+                status, headers = r.status, r.headers
+                body = read_capped(r, max_bytes) if status == 200 else None
+        except ScanCancelled:
+            raise
+        except Exception:
+            return None, False
+        st['bytes'] = len(body or b'')
+    if status == 304:
+        return None, True
+    if body is None:
+        return None, False
+    digest = hashlib.sha256(body).hexdigest()
+    unchanged = digest == store.content_hash(url)
+    store.save_validators(url, headers.get('ETag'), headers.get('Last-Modified'), digest)
+    return body, unchanged
+
+def _revalidated(url: str, store: ResultStore) -> Optional[tuple]:
+    # failures come back as None so PAGE_FLIGHT does not cache them
+    body, unchanged = fetch_revalidate(url, store)
+    return (body, unchanged) if body is not None or unchanged else None
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (0 where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+class RssWindow:
+    """Peak process RSS between its creation and stop(), fed by RSS_MONITOR."""
+
+    def __init__(self):
+        self.start_rss = self.peak = rss_bytes()
+
+    def stop(self) -> dict:
+        RSS_MONITOR.discard(self)
+        end = rss_bytes()
+        self.peak = max(self.peak, end)
+        mb = lambda b: round(b / 1048576, 1)
+        return {'rss_start_mb': mb(self.start_rss), 'rss_peak_mb': mb(self.peak), 'rss_end_mb': mb(end)}
+
+class RssMonitor:
+    """One sampling thread for all running scans. Windows are held weakly, so
+    a scan that dies without calling stop() simply drops out."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self._windows = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def window(self) -> RssWindow:
+        w = RssWindow()
+        with self._lock:
+            self._windows.add(w)
+            if self._thread is None and w.start_rss:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='rss')
+                self._thread.start()
+        return w
+
+    def discard(self, w: RssWindow):
+        with self._lock:
+            self._windows.discard(w)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                windows = list(self._windows)
+            if not windows: continue
+            now = rss_bytes()
+            for w in windows:
+                if now > w.peak: w.peak = now
+
+RSS_MONITOR = RssMonitor()
 
 # ═══════════════════════════════════════════════════════════════
 #  SSE SCAN — runs in thread, pushes JSON events into a queue
 # ═══════════════════════════════════════════════════════════════
 
-def run_scan(target: str, do_ocr_flag: bool, q: queue.Queue):
-    """Full scan; sends structured events to queue for SSE streaming."""
+def run_scan(target: str, do_ocr_flag: bool, q, profile: bool = False, **opts):
+    """Full scan; sends structured events to `q` (a queue.Queue or ScanJob) for SSE streaming.
+
+    `opts` are _scan()'s keyword arguments. With `scan_text`, page text and
+    inline scripts are searched for domains too. With `profile`, the scan
+    thread runs under cProfile and the hottest functions are sent as a
+    'profile' event; pool workers are not profiled. Raises ScanCancelled,
+    without a 'done' event, once `cancel` is set.
+    """
+    prof = None
+    if profile:
+        import cProfile
+        prof = cProfile.Profile()
+        try: prof.enable()
+        except ValueError: prof = None          # another profiler owns the interpreter
+    try:
+        _scan(target, do_ocr_flag, q, prof=prof, **opts)
+    finally:
+        # scan threads are pooled: never leave the profiler on one after an error
+        if prof: prof.disable()
+
+def _scan(target: str, do_ocr_flag: bool, q,
+          ocr_workers: Optional[int] = None, ocr_mode: Optional[str] = None,
+          min_score: Optional[float] = None, crawl_depth: int = 0,
+          max_pages: Optional[int] = None, stream_html: bool = False,
+          incremental: bool = True, scan_text: bool = False,
+          cancel: Optional[CancelToken] = None, prof=None):
+    rss = RSS_MONITOR.window()
+    timings = StageStats()
+    SCAN_TIMINGS.set(timings)
+    SCAN_CANCEL.set(cancel)
+    w0, c0 = time.perf_counter(), time.thread_time()
+
+    def finish():
+        if prof:
+            import pstats
+            prof.disable()
+            out = io.StringIO()
+            pstats.Stats(prof, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            q.put({'type': 'profile', 'top': PROFILE_TOP, 'report': out.getvalue()})
+        wall, cpu = time.perf_counter() - w0, time.thread_time() - c0
+        METRICS.add('scan', wall, cpu)
+        stages = timings.summary()
+        q.put({'type': 'timings', 'wall_s': round(wall, 4), 'cpu_s': round(cpu, 4), 'stages': stages})
+        slow = sorted(stages.items(), key=lambda kv: -kv[1]['wall_s'])[:4]
+        q.put({'type': 'log', 'level': 'info',
+               'msg': f'Timing: {wall:.2f}s wall, {cpu:.2f}s CPU in the scan thread'
+                      + ''.join(f'; {k} {v["wall_s"]:.2f}s over {v["count"]} call(s)' for k, v in slow) + '.'})
+        if rss.start_rss:
+            m = rss.stop()
+            q.put({'type': 'memory', **m})
+            q.put({'type': 'log', 'level': 'info',
+                   'msg': f'Memory: peak RSS {m["rss_peak_mb"]} MB during scan '
+                          f'(start {m["rss_start_mb"]} MB, end {m["rss_end_mb"]} MB).'})
 
     def emit(event_type: str, **kwargs):
+        if event_type == 'done': finish()
         q.put({'type': event_type, **kwargs})
 
     emit('log', level='info', msg=f'Target: {target}')
+    started = time.time()
+    store = RESULT_STORE if incremental else None
+    # the stored inventory depends on these; OCR and fetch options do not
+    options = f'depth={crawl_depth};pages={max_pages or 0};text={int(bool(scan_text))}'
+    prev = store.last_scan(target, options) if store else None
+    unchanged = False
+    page_hash = None
 
     # ── Load HTML ──
     html = ''
     base_url = ''
-    if target.startswith('http://') or target.startswith('https://'):
+    is_url = target.startswith('http://') or target.startswith('https://')
+    stream_html = stream_html and not crawl_depth
+    if prev and is_url and not crawl_depth:
+        stream_html = False                     # revalidate against the last scan instead
+    if stream_html and (is_url or os.path.isfile(target)):
+        base_url = target if is_url else 'https://x.invalid/'
+        emit('log', level='info', msg='Streaming HTML …')
+    elif is_url and store:
+        reuse = prev is not None and prev[2] is not None and not crawl_depth
+        emit('log', level='info', msg='Revalidating URL against the last scan …' if reuse else 'Fetching URL …')
+        data, same = PAGE_FLIGHT.do(('revalidate', target),
+                                    lambda: _revalidated(target, store)) or (None, False)
+        page_hash = store.content_hash(target) if data is not None or same else None
+        # validators may come from a fetch whose scan never finished: only a
+        # match with the last finished scan's page lets its inventory stand in
+        unchanged = reuse and page_hash == prev[2]
+        if data is None and same and not unchanged:
+            data = PAGE_FLIGHT.do(('get', target), lambda: fetch_bytes(target))   # 304, need the body
+        if data is None and not unchanged:
+            emit('log', level='err', msg='Fatal: could not fetch URL.')
+            emit('done')
+            return
+        html = data.decode('utf-8', errors='replace') if data else ''
+        base_url = target
+        emit('log', level='ok', msg='Page unchanged since the last scan.' if unchanged
+                                    else f'Received {len(html)//1024} KB of HTML')
+    elif is_url:
         emit('log', level='info', msg='Fetching URL …')
-        data = fetch_bytes(target)
+        data = PAGE_FLIGHT.do(('get', target), lambda: fetch_bytes(target))
         if not data:
             emit('log', level='err', msg='Fatal: could not fetch URL.')
             emit('done')
@@ -243,167 +1792,992 @@ def run_scan(target: str, do_ocr_flag: bool, q: queue.Queue):
         emit('log', level='err', msg=f"'{target}' is not a reachable URL or local file.")
         emit('done'); return
 
+    check_cancel()
     parsed = urlparse(base_url)
     t_host = parsed.hostname or ''
     t_base = base_domain(t_host)
     emit('log', level='ok', msg=f'Hostname: {t_host}  →  Base domain (PSL): {t_base}')
 
-    # ── Parse HTML ──
-    parser = PageParser(base_url)
-    parser.feed(html)
-    images    = parser.images
-    all_hosts = parser.hosts
-    if t_host: all_hosts.add(t_host)
-
-    # ── Domain classification ──
-    domain_map = {}
-    if t_host: domain_map[t_host] = 'PRIMARY'
-    for h in sorted(all_hosts):
-        if h not in domain_map:
-            domain_map[h] = classify(h, t_base)
-
-    SORT = {'PRIMARY':0,'SUBDOMAIN':1,'CDN':2,'TRACKER':3,'EXTERNAL':4}
-    sorted_domains = sorted(domain_map.items(), key=lambda x: SORT.get(x[1], 5))
-
-    sub_count = sum(1 for _,v in sorted_domains if v == 'SUBDOMAIN')
-    ext_count = sum(1 for _,v in sorted_domains if v not in ('PRIMARY','SUBDOMAIN'))
-
-    emit('log', level='ok', msg=f'Discovered {len(sorted_domains)} domain(s), {len(images)} image(s).')
-
-    no_alt  = [i for i in images if not i['alt']]
-    ext_imgs= [i for i in images if i['host'] and base_domain(i['host']) != t_base]
-    if no_alt:   emit('log', level='warn', msg=f'{len(no_alt)} image(s) missing alt text.')
-    if ext_imgs: emit('log', level='warn', msg=f'{len(ext_imgs)} image(s) from external domains.')
-    trackers = [h for h,c in sorted_domains if c == 'TRACKER']
-    if trackers: emit('log', level='warn', msg=f'{len(trackers)} tracker/analytics domain(s) detected.')
-
-    # ── Emit domains ──
-    for host, cls in sorted_domains:
-        emit('domain', host=host, cls=cls)
-
-    # ── Emit images ──
-    for img in images:
-        emit('image',
-             url=img['url'],
-             alt=img['alt'],
-             host=img['host'],
-             extra=img['extra'],
-             is_external=(img['host'] != '' and base_domain(img['host']) != t_base))
+    crawling = crawl_depth > 0 and base_url == target
+    if unchanged:
+        # ── Unchanged page: reuse the stored inventory, skip parsing ──
+        images, domain_map = store.scan_results(prev[0])
+        emit('log', level='ok', msg=f'Reusing {len(domain_map)} domain(s) and {len(images)} image(s) '
+                                    f'from the scan of {time.strftime("%Y-%m-%d %H:%M", time.localtime(prev[1]))}.')
+    elif crawling:
+        # ── Crawl: domains and images stream out page by page ──
+        emit('log', level='info', msg=f'Crawling depth {crawl_depth}, up to {max_pages or CRAWL_MAX_PAGES} page(s) …')
+        images, domain_map = crawl_site(target, html, t_host, t_base, emit,
+                                        depth=crawl_depth, max_pages=max_pages or CRAWL_MAX_PAGES,
+                                        scan_text=scan_text)
+    elif stream_html:
+        # ── Streaming parse: domains and images go out chunk by chunk ──
+        streamed = stream_parse(target, base_url, t_host, t_base, emit, scan_text)
+        if streamed is None:
+            emit('log', level='err', msg='Fatal: could not fetch URL.' if is_url else 'Fatal: could not read file.')
+            emit('done'); return
+        images, domain_map, size = streamed
+        emit('log', level='ok', msg=f'Parsed {size//1024} KB of HTML while streaming')
+    else:
+        # ── Parse HTML ──
+        parser = page_parser(base_url, scan_text)
+        with stage('parse') as st:
+            st['bytes'] = len(html)
+            parser.feed(html)
+            parser.close()
+        if parser.text_hosts:
+            emit('log', level='info', msg=f'{len(parser.text_hosts)} domain(s) found only in page text and inline scripts.')
+        images = parser.images
+
+        # ── Domain classification ──
+        domain_map = {}
+        if t_host: domain_map[t_host] = 'PRIMARY'
+        with stage('classify'):
+            for h in sorted(parser.hosts):
+                if h not in domain_map:
+                    domain_map[h] = classify(h, t_base)
+
+    # ── Aggregates, one pass over domains and one over images ──
+    per_cls = {}
+    for cls in domain_map.values(): per_cls[cls] = per_cls.get(cls, 0) + 1
+    sub_count = per_cls.get('SUBDOMAIN', 0)
+    ext_count = len(domain_map) - per_cls.get('PRIMARY', 0) - sub_count
+    no_alt, ext_imgs = images.counts(t_base)
+
+    emit('log', level='ok', msg=f'Discovered {len(domain_map)} domain(s), {len(images)} image(s).')
+    if no_alt:   emit('log', level='warn', msg=f'{no_alt} image(s) missing alt text.')
+    if ext_imgs: emit('log', level='warn', msg=f'{ext_imgs} image(s) from external domains.')
+    trackers = per_cls.get('TRACKER', 0)
+    if trackers: emit('log', level='warn', msg=f'{trackers} tracker/analytics domain(s) detected.')
+
+    if unchanged or not (crawling or stream_html):
+        # ── Emit domains ──
+        SORT = {'PRIMARY':0,'SUBDOMAIN':1,'CDN':2,'TRACKER':3,'EXTERNAL':4}
+        for host, cls in sorted(domain_map.items(), key=lambda x: SORT.get(x[1], 5)):
+            emit('domain', host=host, cls=cls)
+
+        # ── Emit images ──
+        for url, alt, host, extra in images.rows():
+            emit('image', url=url, alt=alt, host=host, extra=extra,
+                 is_external=(host != '' and base_domain(host) != t_base))
 
     # ── Stats ──
     emit('stats',
          images=len(images),
-         domains=len(sorted_domains),
+         domains=len(domain_map),
          subdomains=sub_count,
          third_party=ext_count,
          ocr=0)
 
     # ── OCR ──
+    check_cancel()
+    ocr_hits = []
     if not do_ocr_flag:
         emit('log', level='info', msg='OCR skipped.')
-        emit('done'); return
-
-    if not OCR_AVAILABLE:
-        emit('log', level='err', msg='pytesseract/Pillow not installed — OCR unavailable.')
-        emit('done'); return
+    elif not ocr_available():
+        emit('log', level='err', msg='pytesseract/Pillow or the tesseract binary not found — OCR unavailable.')
+    else:
+        ocr_hits = ocr_images(images, target, t_base, emit, ocr_workers=ocr_workers, ocr_mode=ocr_mode,
+                              min_score=min_score, store=store, prev_scan=prev[0] if prev else None)
+
+    # ── History ──
+    check_cancel()
+    if store:
+        with stage('store'):
+            sid = store.record_scan(target, started, domain_map, images, ocr_hits, options, page_hash)
+        if prev:
+            d = store.diff(prev[0], sid)
+            emit('diff', since=prev[1], scan_id=sid, prev_scan_id=prev[0], **d)
+            emit('log', level='info', msg=f'Since last scan: +{len(d["domains"]["added"])} / '
+                                          f'-{len(d["domains"]["removed"])} domain(s), '
+                                          f'+{len(d["ocr"]["added"])} / -{len(d["ocr"]["removed"])} OCR domain(s).')
+    emit('done')
 
-    ocr_targets = images[:30]
-    emit('log', level='ocr', msg=f'Starting OCR on {len(ocr_targets)} image(s) …')
+def ocr_images(images: ImageTable, target: str, t_base: str, emit, ocr_workers: Optional[int] = None,
+               ocr_mode: Optional[str] = None, min_score: Optional[float] = None,
+               store: Optional[ResultStore] = None, prev_scan: Optional[int] = None) -> list:
+    """OCR phase: fetch + triage every candidate, then OCR the best-scoring ones.
+
+    Downloads run on their own pool. Each decoded image is scored with
+    text_score() and, unless it falls below `min_score`, pushed onto a max-heap
+    that the OCR workers drain, so network latency overlaps with tesseract and
+    the OCR budget goes to the most text-like images seen so far. With a
+    `store`, images unchanged since `prev_scan` reuse that scan's hits.
+    Returns [(image_url, found), …] for every image that was OCR'd or reused.
+    """
+    candidates = images.url[:OCR_CANDIDATES]
+    workers = max(1, min(ocr_workers or OCR_WORKERS, OCR_MAX_WORKERS, len(candidates) or 1))
+    mode = ocr_mode if ocr_mode in OCR_MODES else OCR_MODE
+    threshold = OCR_MIN_SCORE if min_score is None else min_score
+    emit('log', level='ocr', msg=f'Starting OCR on up to {OCR_BUDGET} of {len(candidates)} image(s) '
+                                 f'with {workers} worker(s), {mode} mode …')
     total_ocr = 0
-
-    for idx, img_info in enumerate(ocr_targets):
-        url = img_info['url']
+    passes = 0
+    scanned = 0
+    skipped = 0
+    cache_hits = 0
+    shared = 0
+    reused = 0
+    ocr_hits = []
+    t_ocr = time.monotonic()
+    results = queue.Queue()
+    ready = []
+    lock = threading.Lock()
+    budget = [OCR_BUDGET]
+
+    def ocr_stage(item: tuple):
+        _, idx, url, name, pil_img, key, cached = item
+        res = {'idx': idx, 'url': url, 'name': name, 'loaded': True, 'cached': cached is not None}
+        try:
+            check_cancel()
+            res['thumb'] = THUMBS.submit(key.partition(':')[0], pil_img)
+            if cached is not None:
+                res['text'], res['found'] = cached['text'], cached['domains']
+            else:
+                ran = []
+                def run():
+                    errors = []
+                    text, n = ocr_image(pil_img, mode, errors)
+                    found = extract_domains_from_text(text, ocr=True) if text.strip() else []
+                    check_cancel()              # a cut-short run must not be cached
+                    if not errors: OCR_CACHE.put(key, text, found)   # nor one with a failed pass
+                    ran.append(n)
+                    return text, found
+                # another scan may be OCR'ing the same image right now
+                res['text'], res['found'] = OCR_FLIGHT.do(key, run)
+                if ran: res['passes'] = ran[0]
+                else: res['cached'] = res['shared'] = True
+        except Exception as e:
+            res['error'] = str(e)
+        finally:
+            results.put(res)
+
+    def ocr_next():
+        # one call per item left in the heap; always takes the best one waiting
+        with lock:
+            item = heapq.heappop(ready)
+            budget[0] -= 1
+        ocr_stage(item)
+
+    def push_ready(item: tuple):
+        # the heap never holds more images than the budget has OCR runs left:
+        # anything ranked below that can no longer be reached, so drop it now
+        with lock:
+            heapq.heappush(ready, item)
+            drop = None
+            if len(ready) > budget[0]:
+                drop = max(ready)
+                ready.remove(drop)
+                heapq.heapify(ready)
+        if drop is None:
+            submit_ctx(ocr_pool, ocr_next)
+        else:
+            results.put({'idx': drop[1], 'url': drop[2], 'name': drop[3], 'loaded': True,
+                         'skipped': f'over OCR budget (score {-drop[0]:.2f})'})
+
+    def fetch_stage(idx: int, url: str):
+        # the result loop waits for exactly one result per candidate, so one
+        # is sent even when something in here raises
         name = url.split('/')[-1][:50] or f'image-{idx}'
-        emit('log', level='ocr', msg=f'[{idx+1}/{len(ocr_targets)}] OCR: {name}')
-        emit('ocr_progress', idx=idx, total=len(ocr_targets), url=url)
-
-        # Load image
-        pil_img = None
-        thumb_b64 = None
-
-        if url.startswith('https://x.invalid/') or url.startswith('file://'):
-            rel = url.replace('https://x.invalid/','').replace('file://','')
-            for cand in [
-                os.path.join(os.path.dirname(os.path.abspath(target)), rel),
-                rel, os.path.join(os.getcwd(), rel)
-            ]:
-                if os.path.exists(cand):
-                    try:
-                        pil_img = Image.open(cand).convert('RGB')
-                        break
-                    except: pass
-
-        if pil_img is None:
-            pil_img = fetch_image_pil(url)
+        error = 'no result'
+        try:
+            if fetch_triage(idx, url, name): return
+        except Exception as e:
+            error = str(e)
+        results.put({'idx': idx, 'url': url, 'name': name, 'loaded': True, 'error': error})
 
+    def fetch_triage(idx: int, url: str, name: str) -> bool:
+        # True once a result has been sent or the image handed to the OCR side
+        try:
+            check_cancel()
+            if store and url.startswith(('http://', 'https://')) and not url.startswith('https://x.invalid/'):
+                data, same = fetch_revalidate(url, store, max_bytes=IMAGE_MAX_BYTES)
+                prior = store.image_ocr(prev_scan, url) if same and prev_scan else None
+                if prior is not None:
+                    digest = store.content_hash(url)
+                    thumb = THUMBS.url(digest) if digest and THUMBS.has(digest) else None
+                    results.put({'idx': idx, 'url': url, 'name': name, 'loaded': True, 'cached': True,
+                                 'reused': True, 'found': prior, 'text': '', 'thumb': thumb})
+                    return True
+                if data is None and same:
+                    data = fetch_bytes(url, max_bytes=IMAGE_MAX_BYTES)   # 304, nothing stored yet
+            else:
+                data = load_image_bytes(url, target)
+        except ScanCancelled:
+            return False
+        except Exception:
+            data = None
+        pil_img = decode_image(data) if data else None
         if pil_img is None:
-            emit('log', level='warn', msg=f'  Could not load image: {name}')
-            continue
-
-        thumb_b64 = pil_to_b64(pil_img)
-        text = do_ocr(pil_img)
+            results.put({'idx': idx, 'url': url, 'name': name, 'loaded': False})
+            return True
+        key = OCRCache.key(data, f'{mode}.{EXTRACT_VERSION}')
+        cached = OCR_CACHE.get(key)
+        if cached is not None:
+            # already paid for: no triage, no budget
+            submit_ctx(ocr_pool, ocr_stage, (0, idx, url, name, pil_img, key, cached))
+            return True
+        try:
+            with stage('triage'): score, feats = text_score(pil_img)
+        except Exception as e:
+            score, feats = 1.0, {'reason': f'triage failed: {e}'}
+        decision = 'ocr' if score >= threshold else 'skip'
+        emit('ocr_triage', url=url, score=score, decision=decision, **feats)
+        if decision == 'skip':
+            results.put({'idx': idx, 'url': url, 'name': name, 'loaded': True,
+                         'skipped': f'score {score:.2f} < {threshold:.2f}'})
+            return True
+        push_ready((-score, idx, url, name, pil_img, key, None))
+        return True
+
+    fetchers = max(1, min(FETCH_WORKERS, len(candidates) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr') as ocr_pool, \
+         ThreadPoolExecutor(max_workers=fetchers, thread_name_prefix='fetch') as fetch_pool:
+        for idx, url in enumerate(candidates):
+            submit_ctx(fetch_pool, fetch_stage, idx, url)
+
+        # results arrive in completion order, not page order
+        for done in range(1, len(candidates) + 1):
+            while True:
+                try:
+                    check_cancel()
+                    res = results.get(timeout=0.25)
+                    break
+                except queue.Empty:
+                    continue
+                except ScanCancelled:
+                    # drop queued work; running stages see the token and stop
+                    fetch_pool.shutdown(wait=False, cancel_futures=True)
+                    ocr_pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+            url, name = res['url'], res['name']
+            emit('ocr_progress', idx=done, total=len(candidates), url=url, image_idx=res['idx'])
+
+            if not res['loaded']:
+                emit('log', level='warn', msg=f'  Could not load image: {name}')
+                continue
+            if 'skipped' in res:
+                skipped += 1
+                emit('log', level='info', msg=f'  Skipped {name}: {res["skipped"]}')
+                continue
+            if res.get('reused'):
+                reused += 1
+                ocr_hits.append((url, res['found']))
+                emit('log', level='info', msg=f'  Unchanged since last scan: {name}')
+                found = res['found']
+                for d in found:
+                    total_ocr += 1
+                    emit('ocr_domain', host=d['host'], raw=d['raw'],
+                         cls=classify(d['host'], t_base) if t_base else 'EXTERNAL',
+                         thumb=res['thumb'], source_url=url)
+                continue
+            emit('log', level='ocr', msg=f'[{done}/{len(candidates)}] OCR: {name}')
+            if 'error' in res:
+                emit('log', level='warn', msg=f'  OCR failed on {name}: {res["error"]}')
+                continue
+            scanned += 1
+            if res['cached']: cache_hits += 1
+            if res.get('shared'): shared += 1
+            passes += res.get('passes', 0)
+            ocr_hits.append((url, res['found']))
+
+            if not res['text'].strip():
+                emit('log', level='info', msg=f'  No text detected in {name}')
+                continue
+
+            found = res['found']
+            if not found:
+                emit('log', level='info', msg=f'  No domains in {name}')
+                continue
+
+            emit('log', level='ok', msg=f'  {len(found)} domain(s) found in {name}')
+            for d in found:
+                total_ocr += 1
+                cls = classify(d['host'], t_base) if t_base else 'EXTERNAL'
+                emit('ocr_domain',
+                     host=d['host'],
+                     raw=d['raw'],
+                     cls=cls,
+                     thumb=res['thumb'],
+                     source_url=url)
+
+    elapsed = time.monotonic() - t_ocr
+    rate = scanned / elapsed if elapsed > 0 else 0.0
+    emit('log', level='ocr', msg=f'OCR complete — {total_ocr} domain(s) found in images '
+                                 f'({scanned} image(s), {passes} tesseract pass(es) in {elapsed:.1f}s, '
+                                 f'{rate:.2f} img/s, {skipped} skipped by triage, {reused} unchanged).')
+    cs = OCR_CACHE.stats()
+    emit('log', level='info', msg=f'OCR cache: {cache_hits} hit(s) ({shared} shared with concurrent scans), '
+                                  f'{scanned - cache_hits} miss(es) this scan; '
+                                  f'{cs["hits"] + cs["disk_hits"]} hit(s) ({cs["disk_hits"]} from disk), '
+                                  f'{cs["misses"]} miss(es), {cs["entries"]} entries in memory overall.')
+    emit('stats_ocr', ocr=total_ocr, images=scanned, skipped=skipped, reused=reused, workers=workers,
+         mode=mode, passes=passes, seconds=round(elapsed, 3), images_per_sec=round(rate, 3))
+    return ocr_hits
 
-        if not text.strip():
-            emit('log', level='info', msg=f'  No text detected in {name}')
-            continue
+# ═══════════════════════════════════════════════════════════════
+#  JOBS — every scan runs as a job on one bounded scheduler
+# ═══════════════════════════════════════════════════════════════
 
-        found = extract_domains_from_text(text)
-        if not found:
-            emit('log', level='info', msg=f'  No domains in {name}')
-            continue
+MAX_SCANS   = int(os.environ.get('CYBERSCOPE_MAX_SCANS', '4'))
+MAX_INTERACTIVE = int(os.environ.get('CYBERSCOPE_MAX_INTERACTIVE', '2'))
+JOB_HISTORY = int(os.environ.get('CYBERSCOPE_JOB_HISTORY', '500'))
+JOB_EVENT_LOG = int(os.environ.get('CYBERSCOPE_JOB_EVENT_LOG', '20000'))
+JOB_REPLAY_GRACE = float(os.environ.get('CYBERSCOPE_JOB_REPLAY_GRACE', '60'))
+JOB_REPLAY_TAIL  = 100                  # events a finished, unwatched job keeps for late reconnects
+MAX_BATCH   = 1000
+
+def scan_options(src) -> dict:
+    """run_scan keyword arguments from query args or a JSON object."""
+    def num(key, cast):
+        v = src.get(key)
+        try: return cast(v) if v not in (None, '') else None
+        except (TypeError, ValueError): return None
+    return {
+        'do_ocr_flag': src.get('ocr', '1') in (True, 1, '1', 'true'),
+        'ocr_workers': num('workers', int),
+        'ocr_mode':    src.get('mode') if src.get('mode') in OCR_MODES else None,   # JSON may send any type
+        'min_score':   num('min_score', float),
+        'crawl_depth': num('depth', int) or 0,
+        'max_pages':   num('pages', int),
+        'stream_html': src.get('stream', '0') in (True, 1, '1', 'true'),
+        'incremental': src.get('incremental', '1') in (True, 1, '1', 'true'),
+        'profile':     src.get('profile', '0') in (True, 1, '1', 'true'),
+        'scan_text':   src.get('text', '0') in (True, 1, '1', 'true'),
+    }
 
-        emit('log', level='ok', msg=f'  {len(found)} domain(s) found in {name}')
-        for d in found:
-            total_ocr += 1
-            cls = classify(d['host'], t_base) if t_base else 'EXTERNAL'
-            emit('ocr_domain',
-                 host=d['host'],
-                 raw=d['raw'],
-                 cls=cls,
-                 thumb=thumb_b64,
-                 source_url=url)
-
-    emit('log', level='ocr', msg=f'OCR complete — {total_ocr} domain(s) found in images.')
-    emit('stats_ocr', ocr=total_ocr)
-    emit('done')
+class ScanJob:
+    """One queued scan; stands in for run_scan's queue.
+
+    Events go into a bounded, sequence-numbered log that outlives any one
+    HTTP connection, so viewers can attach at any time and reconnecting
+    clients resume after the last sequence number they saw. An `interactive`
+    job is cancelled once it has had no viewer for CANCEL_GRACE seconds.
+    Identical submissions while it runs share it; `owners` counts them.
+    A finished job left without viewers for JOB_REPLAY_GRACE seconds keeps
+    only the last JOB_REPLAY_TAIL events; its results stay in full.
+    """
+
+    def __init__(self, target: str, opts: dict, interactive: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.target = target
+        self.opts = opts
+        self.status = 'queued'
+        self.error = None
+        self.created = time.time()
+        self.started = self.finished = None
+        self.events = deque(maxlen=JOB_EVENT_LOG)
+        self.seq = 0
+        self.closed = False
+        self.domains = {}
+        self.images = 0
+        self.ocr_domains = []
+        self.interactive = interactive
+        self.owners = 1
+        self.viewers = 0
+        self.idle_since = time.monotonic()
+        self.cancel = CancelToken()
+        self._cond = threading.Condition()
+        self.put({'type': 'job', 'id': self.id, 'target': target})
+
+    def share(self, interactive: bool):
+        with self._cond:
+            self.owners += 1
+            self.interactive = self.interactive and interactive
+
+    def release(self, reason: str):
+        """Drop one owner; the last one to go cancels the scan."""
+        with self._cond:
+            self.owners -= 1
+            last = self.owners <= 0 and not self.closed
+        if last: self.cancel.cancel(reason)
+
+    def attach(self):
+        with self._cond:
+            self.viewers += 1
+
+    def detach(self):
+        with self._cond:
+            self.viewers -= 1
+            idle = self.interactive and not self.viewers and not self.closed
+            self.idle_since = time.monotonic()
+        if idle:
+            t = threading.Timer(CANCEL_GRACE, self._cancel_if_idle)
+            t.daemon = True
+            t.start()
+
+    def _cancel_if_idle(self):
+        with self._cond:
+            idle = not self.viewers and not self.closed
+        if idle: self.cancel.cancel('no viewer left')
+
+    def shrink_if_idle(self, grace: float = JOB_REPLAY_GRACE):
+        """Cut a finished job's replay log to its tail once nobody has
+        watched it for `grace` seconds."""
+        with self._cond:
+            if not self.closed or self.viewers or len(self.events) <= JOB_REPLAY_TAIL: return
+            if time.monotonic() - self.idle_since < grace: return
+            self.events = deque(itertools.islice(self.events, len(self.events) - JOB_REPLAY_TAIL, None),
+                                maxlen=JOB_REPLAY_TAIL)
+
+    def put(self, item: dict):
+        with self._cond:
+            self.seq += 1
+            self.events.append((self.seq, item))
+            t = item.get('type')
+            if t == 'domain': self.domains[item['host']] = item['cls']
+            elif t == 'image': self.images += 1
+            elif t == 'ocr_domain':
+                self.ocr_domains.append({k: item[k] for k in ('host', 'raw', 'cls', 'source_url')})
+            elif t == 'done':
+                self.closed = True
+                self.idle_since = time.monotonic()
+            self._cond.notify_all()
+
+    def follow(self, after: int = 0, timeout: float = 120):
+        """Yield (seq, event) for every event after `after`, then live ones
+        until 'done'; (None, None) on idle timeout."""
+        nxt = after + 1
+        while True:
+            with self._cond:
+                if nxt > self.seq:
+                    if self.closed: return
+                    self._cond.wait(timeout)
+                first = self.seq - len(self.events) + 1
+                gap = max(0, first - nxt)
+                nxt = max(nxt, first)
+                batch = list(itertools.islice(self.events, nxt - first, None))
+            if gap:
+                yield None, {'type': 'log', 'level': 'warn',
+                             'msg': f'{gap} event(s) fell out of the replay log.'}
+            if not batch:
+                yield None, None
+                continue
+            for seq, item in batch:
+                nxt = seq + 1
+                yield seq, item
+                if item.get('type') == 'done': return
+
+    def info(self, results: bool = False) -> dict:
+        with self._cond:
+            out = {'id': self.id, 'target': self.target, 'status': self.status, 'error': self.error,
+                   'created': self.created, 'started': self.started, 'finished': self.finished,
+                   'domains': len(self.domains), 'images': self.images,
+                   'ocr_domains': len(self.ocr_domains), 'events': self.seq, 'owners': self.owners}
+            if results:
+                out['results'] = {'domains': dict(self.domains), 'ocr_domains': list(self.ocr_domains)}
+            return out
+
+class JobScheduler:
+    """Runs ScanJobs on at most `max_scans` threads; fetch and OCR concurrency
+    is further capped process-wide by MAX_FETCHES and MAX_OCR.
+
+    Interactive (/scan) jobs also get `max_interactive` slots of their own,
+    so a large batch never queues the UI behind it. Submitting a target with
+    the same options as a queued or running job returns that job, so every
+    subscriber follows one scan.
+    """
+
+    def __init__(self, max_scans: int = MAX_SCANS, history: int = JOB_HISTORY,
+                 max_interactive: int = MAX_INTERACTIVE):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_scans), thread_name_prefix='scan')
+        self._ui_pool = ThreadPoolExecutor(max_workers=max(1, max_interactive), thread_name_prefix='scan-ui')
+        self._jobs = OrderedDict()
+        self._active = {}                       # (target, options) -> unfinished job
+        self._lock = threading.Lock()
+        self.history = history
+        self.coalesced = 0
+        self._sweeper = None
+
+    def _sweep(self):
+        # one thread for all jobs: finished, unwatched ones drop their replay logs
+        while True:
+            time.sleep(max(1.0, JOB_REPLAY_GRACE / 4))
+            for job in self.jobs(): job.shrink_if_idle()
+
+    def submit(self, target: str, opts: dict, interactive: bool = False) -> ScanJob:
+        key = (target, tuple(sorted(opts.items())))
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None and not job.cancel.cancelled:
+                job.share(interactive)
+                self.coalesced += 1
+                # a UI viewer joining a batch job still queued lifts it to a UI slot
+                if interactive and job.status == 'queued': self._ui_pool.submit(self._run, job, key)
+                return job
+            job = self._active[key] = ScanJob(target, opts, interactive)
+            self._jobs[job.id] = job
+            self._trim()
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep, daemon=True, name='job-sweep')
+                self._sweeper.start()
+        (self._ui_pool if interactive else self._pool).submit(self._run, job, key)
+        return job
+
+    def _trim(self):
+        finished = [j for j in self._jobs.values() if j.status in ('done', 'error', 'cancelled')]
+        for j in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[j.id]
+
+    def _run(self, job: ScanJob, key: tuple):
+        with self._lock:
+            if job.status != 'queued': return   # already picked up by the other pool
+            job.status, job.started = 'running', time.time()
+        try:
+            job.cancel.check()
+            run_scan(job.target, q=job, cancel=job.cancel, **job.opts)
+            job.status = 'done'
+        except ScanCancelled as e:
+            job.status = 'cancelled'
+            job.put({'type':'log','level':'warn','msg': f'Scan cancelled: {e}.'})
+            job.put({'type':'done','cancelled': True})
+        except Exception as e:
+            job.status, job.error = 'error', str(e)
+            job.put({'type':'log','level':'err','msg': str(e)})
+            job.put({'type':'done'})
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                if self._active.get(key) is job: del self._active[key]
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str, reason: str = 'cancelled by request') -> Optional[ScanJob]:
+        job = self.get(job_id)
+        if job is not None and not job.closed: job.release(reason)
+        return job
+
+    def jobs(self) -> list:
+        with self._lock:
+            return list(self._jobs.values())
+
+SCHEDULER = JobScheduler()
+
+def last_event_id() -> Optional[tuple]:
+    """(job_id, seq) from a Last-Event-ID header or ?last_event_id=."""
+    raw = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or ''
+    job_id, _, seq = raw.partition(':')
+    return (job_id, int(seq)) if job_id and seq.isdigit() else None
+
+ROUTES = []
+_APP = None
+
+def route(rule: str, **options):
+    """Register a view for create_app(); Flask itself is imported only then."""
+    def deco(fn):
+        ROUTES.append((rule, fn, options))
+        return fn
+    return deco
+
+def create_app():
+    from flask import Flask
+    flask_app = Flask(__name__)
+    for rule, fn, options in ROUTES:
+        flask_app.add_url_rule(rule, view_func=fn, **options)
+    return flask_app
+
+def get_app():
+    """The shared Flask app, built on first use."""
+    global _APP
+    if _APP is None: _APP = create_app()
+    return _APP
+
+def __getattr__(name: str):
+    # `app.app` stays available to WSGI servers and `flask run`
+    if name == 'app': return get_app()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+SSE_BATCH_WINDOW = float(os.environ.get('CYBERSCOPE_SSE_BATCH_MS', '150')) / 1000
+SSE_BATCH_EVENTS = 500
+SSE_BATCH_BYTES  = 256 * 1024
+SSE_PING_EVERY   = 120
+SSE_STATS = {'streams': 0, 'events': 0, 'frames': 0, 'raw_bytes': 0, 'wire_bytes': 0}
+SSE_STATS_LOCK = threading.Lock()
+
+def sse_stream(job: ScanJob, after: int = 0, batch: bool = False, compress: bool = False):
+    """Stream `job` as SSE.
+
+    Event ids are "<job id>:<seq>" so a plain EventSource reconnect finds its
+    job again. With `batch`, events are coalesced into 'batch' frames bounded
+    by SSE_BATCH_WINDOW / _EVENTS / _BYTES and each distinct thumbnail is sent
+    once as a 'thumb' event that later events reference by `thumb_id`. With
+    `compress`, the body is gzip'd and sync-flushed after every frame.
+    """
+    stats = {'events': 0, 'frames': 0, 'raw_bytes': 0, 'wire_bytes': 0}
 
-@app.route('/')
+    def generate():
+        t0 = last_sent = time.monotonic()
+        gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        thumbs = {}
+        pending, pending_size, last_seq, first_at = [], 0, None, 0.0
+
+        def frame(text: str, n_events: int = 0) -> bytes:
+            nonlocal last_sent
+            data = text.encode()
+            stats['raw_bytes'] += len(data)
+            if gz: data = gz.compress(data) + gz.flush(zlib.Z_SYNC_FLUSH)
+            stats['wire_bytes'] += len(data)
+            stats['events'] += n_events
+            stats['frames'] += 1
+            last_sent = time.monotonic()
+            return data
+
+        def flush() -> bytes:
+            nonlocal pending, pending_size, last_seq
+            body = json.dumps({'type': 'batch', 'events': pending})
+            head = f"id: {job.id}:{last_seq}\n" if last_seq else ''
+            out = frame(f"{head}data: {body}\n\n", len(pending))
+            pending, pending_size, last_seq = [], 0, None
+            return out
+
+        def transport_stats() -> dict:
+            # counts the frame this goes out in; bytes cover the frames already sent
+            el = time.monotonic() - t0
+            events = stats['events'] + len(pending) + 1
+            return {'type': 'transport', 'seconds': round(el, 3), 'events': events,
+                    'frames': stats['frames'] + 1, 'raw_bytes': stats['raw_bytes'],
+                    'wire_bytes': stats['wire_bytes'],
+                    'events_per_sec': round(events / el, 1) if el > 0 else 0.0}
+
+        yield frame("retry: 3000\n\n")
+        for seq, item in job.follow(after=after, timeout=SSE_BATCH_WINDOW if batch else SSE_PING_EVERY):
+            if item is not None and item.get('type') == 'done':
+                if batch: pending.append(transport_stats())
+                else: yield frame(f"data: {json.dumps(transport_stats())}\n\n", 1)
+            if not batch:
+                if item is None:
+                    yield frame("data: {\"type\":\"ping\"}\n\n")
+                elif seq is None:
+                    yield frame(f"data: {json.dumps(item)}\n\n", 1)
+                else:
+                    yield frame(f"id: {job.id}:{seq}\ndata: {json.dumps(item)}\n\n", 1)
+                continue
+
+            now = time.monotonic()
+            if item is not None:
+                thumb = item.get('thumb')
+                if thumb:
+                    tid = thumbs.get(thumb)
+                    if tid is None:
+                        tid = thumbs[thumb] = len(thumbs) + 1
+                        pending.append({'type': 'thumb', 'id': tid, 'data': thumb})
+                        pending_size += len(thumb)
+                    item = {**item, 'thumb': None, 'thumb_id': tid}
+                if not pending: first_at = now
+                pending.append(item)
+                pending_size += 64 + sum(len(v) for v in item.values() if isinstance(v, str))
+                if seq is not None: last_seq = seq
+            if pending and (len(pending) >= SSE_BATCH_EVENTS or pending_size >= SSE_BATCH_BYTES
+                            or now - first_at >= SSE_BATCH_WINDOW
+                            or (item is not None and item.get('type') == 'done')):
+                yield flush()
+            elif not pending and now - last_sent >= SSE_PING_EVERY:
+                yield frame("data: {\"type\":\"ping\"}\n\n")
+        if pending: yield flush()
+        if gz: yield gz.flush()
+        with SSE_STATS_LOCK:
+            SSE_STATS['streams'] += 1
+            for k, v in stats.items(): SSE_STATS[k] += v
+
+    def watched():
+        # a disconnecting client closes the generator, so detach runs then too
+        job.attach()
+        try: yield from generate()
+        finally: job.detach()
+
+    headers = {'Cache-Control':'no-cache','X-Accel-Buffering':'no'}
+    if compress: headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(watched()), mimetype='text/event-stream', headers=headers)
+
+def stream_options() -> dict:
+    """sse_stream transport flags from the request; gzip only if the client accepts it."""
+    return {'batch': request.args.get('batch') == '1',
+            'compress': request.args.get('compress') == '1'
+                        and 'gzip' in request.headers.get('Accept-Encoding', '')}
+
+@route('/')
 def index():
     return render_template_string(HTML_PAGE)
 
-@app.route('/scan')
+@route('/scan')
 def scan_sse():
     target   = request.args.get('target', '').strip()
-    do_ocr_f = request.args.get('ocr', '1') == '1'
+    resume = last_event_id()
+    job = SCHEDULER.get(resume[0]) if resume else None
+    if job is not None:
+        return sse_stream(job, after=resume[1], **stream_options())
     if not target:
         return Response('data: {"type":"error","msg":"No target"}\n\n',
                         mimetype='text/event-stream')
+    job = SCHEDULER.submit(target, scan_options(request.args), interactive=True)
+    return sse_stream(job, **stream_options())
+
+@route('/thumb/<digest>.jpg')
+def thumbnail(digest):
+    if not re.fullmatch(r'[0-9a-f]{64}', digest):
+        return {'error': 'Bad thumbnail id'}, 404
+    etag = f'"{digest}"'
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    data = THUMBS.get(digest)
+    if data is None:
+        return {'error': 'Unknown or evicted thumbnail'}, 404
+    return Response(data, mimetype='image/jpeg',
+                    headers={'Cache-Control': 'public, max-age=31536000, immutable', 'ETag': etag})
+
+@route('/history')
+def history():
+    target = request.args.get('target', '').strip()
+    if RESULT_STORE is None: return {'error': 'Result store disabled (set CYBERSCOPE_STORE)'}, 404
+    return {'target': target, 'scans': RESULT_STORE.scans(target)}
+
+@route('/diff')
+def scan_diff():
+    target = request.args.get('target', '').strip()
+    if RESULT_STORE is None: return {'error': 'Result store disabled (set CYBERSCOPE_STORE)'}, 404
+    scans = RESULT_STORE.scans(target, limit=2)
+    old = request.args.get('from', type=int) or (scans[1]['id'] if len(scans) > 1 else None)
+    new = request.args.get('to', type=int) or (scans[0]['id'] if scans else None)
+    if old is None or new is None: return {'error': 'Need two scans to diff'}, 404
+    return {'target': target, 'from': old, 'to': new, **RESULT_STORE.diff(old, new)}
+
+def metrics_text() -> str:
+    """Stage histograms, SSE transport, OCR cache and job counts in the
+    Prometheus text exposition format."""
+    stages = METRICS.snapshot()
+    out = ['# HELP cyberscope_stage_seconds Wall time per scan stage.',
+           '# TYPE cyberscope_stage_seconds histogram']
+    for name, s in sorted(stages.items()):
+        acc = 0
+        for le, n in zip(TIMING_BUCKETS, s['buckets']):
+            acc += n
+            out.append(f'cyberscope_stage_seconds_bucket{{stage="{name}",le="{le}"}} {acc}')
+        out.append(f'cyberscope_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {s["count"]}')
+        out.append(f'cyberscope_stage_seconds_sum{{stage="{name}"}} {s["wall"]:.6f}')
+        out.append(f'cyberscope_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+    out += ['# HELP cyberscope_stage_cpu_seconds_total CPU time of the calling thread per scan stage.',
+            '# TYPE cyberscope_stage_cpu_seconds_total counter']
+    out += [f'cyberscope_stage_cpu_seconds_total{{stage="{n}"}} {s["cpu"]:.6f}' for n, s in sorted(stages.items())]
+    out += ['# HELP cyberscope_stage_bytes_total Bytes fetched, decoded, parsed or rendered per stage.',
+            '# TYPE cyberscope_stage_bytes_total counter']
+    out += [f'cyberscope_stage_bytes_total{{stage="{n}"}} {s["bytes"]}' for n, s in sorted(stages.items())]
+    with SSE_STATS_LOCK:
+        sse = dict(SSE_STATS)
+    for k, v in sse.items():
+        out += [f'# TYPE cyberscope_sse_{k}_total counter', f'cyberscope_sse_{k}_total {v}']
+    cs = OCR_CACHE.stats()
+    for k in ('hits', 'disk_hits', 'misses'):
+        out += [f'# TYPE cyberscope_ocr_cache_{k}_total counter', f'cyberscope_ocr_cache_{k}_total {cs[k]}']
+    for k in ('entries', 'bytes'):
+        out += [f'# TYPE cyberscope_ocr_cache_{k} gauge', f'cyberscope_ocr_cache_{k} {cs[k]}']
+    status = {}
+    for j in SCHEDULER.jobs(): status[j.status] = status.get(j.status, 0) + 1
+    out.append('# TYPE cyberscope_jobs gauge')
+    out += [f'cyberscope_jobs{{status="{k}"}} {status.get(k, 0)}' for k in ('queued', 'running', 'done', 'error', 'cancelled')]
+    out += ['# HELP cyberscope_shared_total Work coalesced across concurrent scans: run once, '
+            'shared in flight, or served from the short-lived result cache.',
+            '# TYPE cyberscope_shared_total counter']
+    for f in FLIGHTS:
+        fs = f.stats()
+        out += [f'cyberscope_shared_total{{flight="{f.name}",result="{k}"}} {fs[k]}' for k in ('runs', 'shared', 'cached')]
+    out += ['# TYPE cyberscope_jobs_coalesced_total counter', f'cyberscope_jobs_coalesced_total {SCHEDULER.coalesced}']
+    out += ['# TYPE cyberscope_rss_bytes gauge', f'cyberscope_rss_bytes {rss_bytes()}']
+    return '\n'.join(out) + '\n'
+
+@route('/metrics')
+def metrics():
+    return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
+
+@route('/jobs', methods=['POST'])
+def jobs_create():
+    body = request.get_json(silent=True) or request.form.to_dict()
+    targets = body.get('targets') or []
+    if isinstance(targets, str): targets = targets.split()
+    targets = [t.strip() for t in targets if isinstance(t, str) and t.strip()]
+    if not targets:
+        return {'error': 'No targets'}, 400
+    if len(targets) > MAX_BATCH:
+        return {'error': f'At most {MAX_BATCH} targets per batch'}, 400
+    opts = scan_options(body)
+    jobs = [SCHEDULER.submit(t, opts) for t in targets]
+    return {'jobs': [{'id': j.id, 'target': j.target, 'status': j.status} for j in jobs]}, 202
+
+@route('/jobs')
+def jobs_list():
+    return {'jobs': [j.info() for j in SCHEDULER.jobs()]}
+
+@route('/jobs/<job_id>')
+def job_status(job_id):
+    job = SCHEDULER.get(job_id)
+    if job is None: return {'error': 'Unknown job'}, 404
+    return job.info(results=True)
+
+@route('/jobs/<job_id>', methods=['DELETE'])
+def job_cancel(job_id):
+    job = SCHEDULER.cancel(job_id)
+    if job is None: return {'error': 'Unknown job'}, 404
+    return job.info()
+
+@route('/jobs/<job_id>/stream')
+def job_stream(job_id):
+    job = SCHEDULER.get(job_id)
+    if job is None: return {'error': 'Unknown job'}, 404
+    resume = last_event_id()
+    return sse_stream(job, after=resume[1] if resume and resume[0] == job_id else 0, **stream_options())
+
+# ═══════════════════════════════════════════════════════════════
+#  HEADLESS — generator API and JSON Lines CLI, no HTTP in between
+# ═══════════════════════════════════════════════════════════════
 
-    q = queue.Queue()
+class _TaggedQueue:
+    """run_scan's queue for one of several scans sharing a results queue."""
 
-    def background():
-        try:
-            run_scan(target, do_ocr_f, q)
-        except Exception as e:
-            q.put({'type':'log','level':'err','msg': str(e)})
-            q.put({'type':'done'})
+    def __init__(self, index: int, target: str, out):
+        self.index, self.target, self.out = index, target, out
 
-    t = threading.Thread(target=background, daemon=True)
-    t.start()
+    def put(self, item: dict):
+        self.out.put((self.index, self.target, item))
 
-    def generate():
-        while True:
-            try:
-                item = q.get(timeout=120)
-                yield f"data: {json.dumps(item)}\n\n"
-                if item.get('type') == 'done':
-                    break
-            except queue.Empty:
-                yield "data: {\"type\":\"ping\"}\n\n"
+def scan_many(targets, parallelism: int = MAX_SCANS, **opts):
+    """Scan `targets` with up to `parallelism` scans at once, yielding
+    (index, target, event) in arrival order; `index` is the target's
+    position in `targets`, so repeated targets stay apart, and each scan's
+    events end with 'done'.
 
-    return Response(stream_with_context(generate()),
-                    mimetype='text/event-stream',
-                    headers={'Cache-Control':'no-cache','X-Accel-Buffering':'no'})
+    `targets` is consumed lazily, so it may be an open file or stdin. `opts`
+    are run_scan keyword arguments, e.g. from scan_options(). Closing the
+    generator early cancels the scans still running.
+    """
+    out = queue.SimpleQueue()
+    tokens = set()
+
+    def run(index: int, target: str, token: CancelToken):
+        q = _TaggedQueue(index, target, out)
+        try:
+            run_scan(target, q=q, cancel=token, **opts)
+        except ScanCancelled as e:
+            q.put({'type': 'log', 'level': 'warn', 'msg': f'Scan cancelled: {e}.'})
+            q.put({'type': 'done', 'cancelled': True})
+        except Exception as e:
+            q.put({'type': 'log', 'level': 'err', 'msg': str(e)})
+            q.put({'type': 'done'})
+        finally:
+            tokens.discard(token)
+
+    def start(entry: tuple):
+        token = CancelToken()
+        tokens.add(token)
+        pool.submit(run, *entry, token)
+
+    todo = enumerate(targets)
+    running = 0
+    with ThreadPoolExecutor(max_workers=max(1, parallelism), thread_name_prefix='scan') as pool:
+        try:
+            for entry in itertools.islice(todo, max(1, parallelism)):
+                start(entry); running += 1
+            while running:
+                index, target, item = out.get()
+                yield index, target, item
+                if item.get('type') == 'done':
+                    running -= 1
+                    nxt = next(todo, None)
+                    if nxt is not None:
+                        start(nxt); running += 1
+        finally:
+            # the caller stopped early (or Ctrl+C): wind the remaining scans down
+            for token in list(tokens): token.cancel('consumer went away')
+
+def scan_events(target: str, **opts):
+    """Run one scan and yield its events as dicts, ending with 'done'."""
+    for _, _, item in scan_many([target], 1, **opts):
+        yield item
+
+def _read_targets(lines):
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'): yield line
+
+def cli_scan(args) -> int:
+    """`app.py scan`: one JSON object per line on stdout, each tagged with its
+    target and `scan`, the target's position in the input."""
+    if args.targets and args.file:
+        sys.exit('Give targets as arguments or with --file, not both.')
+    if args.file:
+        targets = _read_targets(sys.stdin if args.file == '-' else open(args.file, encoding='utf-8'))
+    elif args.targets:
+        targets = iter(args.targets)
+    elif not sys.stdin.isatty():
+        targets = _read_targets(sys.stdin)
+    else:
+        sys.exit('No targets: pass them as arguments, with --file, or on stdin.')
+    opts = scan_options({'ocr': not args.no_ocr, 'workers': args.workers, 'mode': args.mode,
+                         'min_score': args.min_score, 'depth': args.depth, 'pages': args.pages,
+                         'stream': args.stream, 'incremental': not args.no_incremental,
+                         'profile': args.profile, 'text': args.text})
+    only = set(filter(None, (args.only or '').split(',')))
+    results = {}
+    write, dumps = sys.stdout.write, json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    try:
+        for index, target, item in scan_many(targets, args.parallel, **opts):
+            t = item.get('type')
+            if args.summary:
+                r = results.setdefault(index, {'target': target, 'scan': index, 'started': time.time(),
+                                               'domains': {}, 'images': 0, 'ocr_domains': [], 'errors': []})
+                if t == 'domain': r['domains'][item['host']] = item['cls']
+                elif t == 'image': r['images'] += 1
+                elif t == 'ocr_domain':
+                    r['ocr_domains'].append({k: item[k] for k in ('host', 'raw', 'cls', 'source_url')})
+                elif t == 'log' and item.get('level') == 'err': r['errors'].append(item['msg'])
+                elif t == 'done':
+                    r = results.pop(index)
+                    r['seconds'] = round(time.time() - r.pop('started'), 3)
+                    write(dumps(r) + '\n'); sys.stdout.flush()
+                continue
+            if only and t not in only and t != 'done': continue
+            write(dumps({'target': target, 'scan': index, **item}) + '\n')
+            if t == 'done': sys.stdout.flush()
+    except BrokenPipeError:
+        # reader went away (e.g. `| head`); don't let the interpreter complain on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 0
+
+def serve(host: str = '0.0.0.0', port: int = 8000):
+    print("\n  CYBERSCOPE Flask Server")
+    print("  ─────────────────────────────────────")
+    print(f"  http://localhost:{port}")
+    print("  OCR available:", ocr_available())
+    print("  Press Ctrl+C to quit\n")
+    get_app().run(host=host, port=port, debug=False, threaded=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog='app.py', description='CYBERSCOPE — domain and image reconnaissance')
+    sub = ap.add_subparsers(dest='cmd')
+    p = sub.add_parser('serve', help='run the web interface (default)')
+    p.add_argument('--host', default='0.0.0.0')
+    p.add_argument('--port', type=int, default=int(os.environ.get('CYBERSCOPE_PORT', '8000')))
+    p = sub.add_parser('scan', help='scan targets headlessly, events as JSON Lines on stdout')
+    p.add_argument('targets', nargs='*', help='URLs or local HTML files')
+    p.add_argument('-f', '--file', help="file with one target per line ('-' for stdin)")
+    p.add_argument('-j', '--parallel', type=int, default=MAX_SCANS, help='scans run at once')
+    p.add_argument('--no-ocr', action='store_true', help='skip OCR of images')
+    p.add_argument('--mode', choices=OCR_MODES, help='OCR strategy')
+    p.add_argument('--workers', type=int, help='OCR workers per scan')
+    p.add_argument('--min-score', type=float, help='triage threshold for OCR candidates')
+    p.add_argument('--depth', type=int, default=0, help='crawl same-site links this deep')
+    p.add_argument('--pages', type=int, help='crawl at most this many pages')
+    p.add_argument('--stream', action='store_true', help='parse HTML while it downloads')
+    p.add_argument('--text', action='store_true', help='also find domains in page text and inline scripts')
+    p.add_argument('--no-incremental', action='store_true', help='ignore the result store')
+    p.add_argument('--profile', action='store_true', help="add a cProfile 'profile' event per scan")
+    p.add_argument('--only', help='comma-separated event types to print (done is always printed)')
+    p.add_argument('--summary', action='store_true', help='print one result object per target instead of events')
+    args = ap.parse_args(argv)
+    if args.cmd == 'scan':
+        return cli_scan(args)
+    serve(getattr(args, 'host', '0.0.0.0'), getattr(args, 'port', int(os.environ.get('CYBERSCOPE_PORT', '8000'))))
+    return 0
 
 HTML_PAGE = r"""<!DOCTYPE html>
 <html lang="en">
@@ -473,6 +2847,8 @@ main{max-width:1400px;margin:0 auto;padding:28px 36px;}
 .toggle{display:flex;align-items:center;gap:7px;cursor:pointer;color:var(--text);}
 .toggle input{accent-color:var(--purple);cursor:pointer;width:13px;height:13px;}
 .hint{color:var(--dim);font-size:10px;}
+.sel{background:var(--surface);border:1px solid var(--border);color:var(--text);
+  font-family:'Share Tech Mono',monospace;font-size:11px;padding:2px 6px;outline:none;}
 .pbar{height:2px;background:linear-gradient(90deg,var(--accent),var(--accent2));width:0%;transition:width .3s;margin-top:10px;}
 
 /* TERMINAL */
@@ -518,19 +2894,22 @@ main{max-width:1400px;margin:0 auto;padding:28px 36px;}
 .rbadge.p{background:rgba(167,139,250,.08);border-color:rgba(167,139,250,.25);color:var(--purple);}
 .rbody{padding:11px;max-height:480px;overflow-y:auto;}
 .empty{color:var(--dim);font-size:11px;padding:10px;}
+/* windowed lists: rows are absolutely placed at index × row pitch */
+.vinner{position:relative;}
+.vinner>div{position:absolute;left:0;right:0;}
+.clip{white-space:nowrap;overflow:hidden;text-overflow:ellipsis;}
 
 /* DOMAIN ROWS */
-.drow{padding:7px 11px;margin-bottom:4px;background:var(--surface);
+.drow{height:32px;padding:7px 11px;background:var(--surface);
   border-left:3px solid var(--dim);display:flex;align-items:center;gap:9px;
-  opacity:0;animation:si .28s forwards;transition:background .2s;}
+  transition:background .2s;}
 .drow:hover{background:rgba(0,229,255,.04);}
 .drow.PRIMARY{border-left-color:var(--accent3);}
 .drow.SUBDOMAIN{border-left-color:var(--accent);}
 .drow.EXTERNAL{border-left-color:var(--warn);}
 .drow.CDN{border-left-color:var(--accent2);}
 .drow.TRACKER{border-left-color:var(--orange);}
-@keyframes si{from{opacity:0;transform:translateX(-7px)}to{opacity:1;transform:none}}
-.dname{color:var(--bright);font-size:12px;flex:1;word-break:break-all;}
+.dname{color:var(--bright);font-size:12px;flex:1;min-width:0;}
 .dtag{font-size:9px;letter-spacing:2px;padding:1px 7px;border:1px solid;white-space:nowrap;}
 .tPRIMARY{color:var(--accent3);border-color:rgba(57,255,20,.35);}
 .tSUBDOMAIN{color:var(--accent);border-color:rgba(0,229,255,.35);}
@@ -539,32 +2918,30 @@ main{max-width:1400px;margin:0 auto;padding:28px 36px;}
 .tTRACKER{color:var(--orange);border-color:rgba(255,107,0,.35);}
 
 /* IMAGE ROWS */
-.irow2{padding:7px 11px;margin-bottom:5px;background:var(--surface);
-  border-left:3px solid var(--dim);display:flex;gap:9px;
-  opacity:0;animation:si .28s forwards;}
+.irow2{height:60px;padding:7px 11px;background:var(--surface);
+  border-left:3px solid var(--dim);display:flex;gap:9px;}
 .irow2.has-ext{border-left-color:var(--warn);}
 .ithumb{width:46px;height:46px;background:#0a1520;border:1px solid var(--border);
   flex-shrink:0;overflow:hidden;display:flex;align-items:center;justify-content:center;cursor:pointer;}
 .ithumb img{width:100%;height:100%;object-fit:cover;}
 .ithumb .ph{font-size:18px;color:var(--dim);}
 .iinfo{flex:1;min-width:0;}
-.iurl{color:var(--bright);font-size:11px;word-break:break-all;line-height:1.5;}
-.imeta{margin-top:4px;display:flex;gap:5px;flex-wrap:wrap;}
+.iurl{color:var(--bright);font-size:11px;line-height:1.5;}
+.imeta{margin-top:4px;display:flex;gap:5px;overflow:hidden;}
 .ib{font-size:9px;padding:1px 6px;border:1px solid var(--border);color:var(--dim);}
 .ib.ha{color:var(--accent3);border-color:rgba(57,255,20,.35);}
 .ib.na{color:var(--accent2);border-color:rgba(255,60,110,.35);}
 .ib.ex{color:var(--warn);border-color:rgba(255,183,0,.35);}
 
 /* OCR ROWS */
-.orow{padding:8px 11px;margin-bottom:5px;background:var(--surface);
-  border-left:3px solid var(--purple);display:flex;flex-direction:column;gap:4px;
-  opacity:0;animation:si .28s forwards;}
-.ohost{color:#c4b5fd;font-size:12px;word-break:break-all;}
-.ometa{display:flex;gap:8px;flex-wrap:wrap;align-items:center;margin-top:2px;}
+.orow{height:72px;padding:8px 11px;background:var(--surface);
+  border-left:3px solid var(--purple);display:flex;flex-direction:column;gap:4px;}
+.ohost{color:#c4b5fd;font-size:12px;}
+.ometa{display:flex;gap:8px;align-items:center;margin-top:2px;overflow:hidden;}
 .othumb{max-width:64px;max-height:34px;border:1px solid rgba(167,139,250,.35);
   object-fit:cover;cursor:pointer;}
 .obadge{font-size:9px;padding:1px 6px;border:1px solid rgba(167,139,250,.35);color:var(--purple);}
-.oraw{font-size:9px;color:#6b7280;font-style:italic;word-break:break-all;}
+.oraw{font-size:9px;color:#6b7280;font-style:italic;min-width:0;}
 
 /* LIGHTBOX */
 .lb{display:none;position:fixed;inset:0;background:rgba(0,0,0,.88);
@@ -610,6 +2987,32 @@ main{max-width:1400px;margin:0 auto;padding:28px 36px;}
         <input type="checkbox" id="ocrCheck" checked />
         <span>Enable Tesseract OCR (finds domains inside image text)</span>
       </label>
+      <label class="toggle">
+        <input type="checkbox" id="streamCheck" checked />
+        <span>Stream parse</span>
+      </label>
+      <label class="toggle">
+        <input type="checkbox" id="textCheck" />
+        <span>Scan page text</span>
+      </label>
+      <label class="toggle">
+        <span>Mode</span>
+        <select class="sel" id="ocrMode">
+          <option value="exhaustive">exhaustive</option>
+          <option value="early">early exit</option>
+          <option value="adaptive">adaptive</option>
+          <option value="data">single pass</option>
+        </select>
+      </label>
+      <label class="toggle">
+        <span>Crawl depth</span>
+        <select class="sel" id="crawlDepth">
+          <option value="0">off</option>
+          <option value="1">1</option>
+          <option value="2">2</option>
+          <option value="3">3</option>
+        </select>
+      </label>
       <span class="hint">// Scans every image with OCR</span>
     </div>
     <div class="pbar" id="pbar"></div>
@@ -664,98 +3067,311 @@ main{max-width:1400px;margin:0 auto;padding:28px 36px;}
 const CLS_CSS = {PRIMARY:'PRIMARY',SUBDOMAIN:'SUBDOMAIN',CDN:'CDN',TRACKER:'TRACKER',EXTERNAL:'EXTERNAL'};
 const CLS_LABEL = {PRIMARY:'PRIMARY',SUBDOMAIN:'SUBDOMAIN',CDN:'CDN',TRACKER:'TRACKER',EXTERNAL:'EXTERNAL'};
 
-let domCount=0, imgCount=0, ocrCount=0;
-let es = null;
+// row pitch in px (row height in the CSS + gap), rows kept beyond the viewport,
+// event-handling time per animation frame and terminal lines kept
+const ROW_DOM = 36, ROW_IMG = 65, ROW_OCR = 78, OVERSCAN = 6, FRAME_BUDGET_MS = 8, LOG_MAX = 1500;
 
-function log(msg, level='info'){
-  const t = document.getElementById('terminal');
-  t.classList.add('on');
-  const d = document.createElement('div');
-  d.className = 'll ' + level;
-  const ts = new Date().toISOString().slice(11,23);
-  d.textContent = '['+ts+'] '+msg;
-  t.appendChild(d);
-  t.scrollTop = t.scrollHeight;
-}
+let es = null, jobId = null;
+let thumbs = {};
+let queue = [], qHead = 0, frameQueued = false, countsDirty = false;
+let logFrag = null;
 
-function setProgress(p){ document.getElementById('pbar').style.width = p+'%'; }
-
-function openLb(src){ document.getElementById('lbImg').src=src; document.getElementById('lb').classList.add('on'); }
-function closeLb(){ document.getElementById('lb').classList.remove('on'); }
+function esc(s){
+  return String(s==null?'':s).replace(/[&<>"']/g, c=>({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[c]));
+}
 
-function addDomain(host, cls){
-  const list = document.getElementById('lDom');
-  if(list.querySelector('.empty')) list.innerHTML='';
-  domCount++;
-  document.getElementById('cDom').textContent = domCount+' HOSTS';
-  document.getElementById('nDom').textContent = domCount;
+// Previews are fetched only once their row scrolls into view.
+const previews = new IntersectionObserver(entries=>{
+  entries.forEach(en=>{
+    if(!en.isIntersecting) return;
+    previews.unobserve(en.target);
+    en.target.src = en.target.dataset.src;
+  });
+}, {rootMargin:'64px'});
+
+function lazyImg(src, cls, onfail){
+  const img = document.createElement('img');
+  img.alt = '';
+  if(cls) img.className = cls;
+  img.dataset.src = src;
+  img.onclick = ()=>openLb(src);
+  if(onfail) img.onerror = onfail;
+  previews.observe(img);
+  return img;
+}
 
+// Windowed list: `items` holds every row's data, but only the rows near the
+// viewport exist in the DOM; they are added and dropped as the list scrolls.
+function VList(id, pitch, make){
+  this.el = document.getElementById(id);
+  this.inner = document.createElement('div');
+  this.inner.className = 'vinner';
+  this.el.appendChild(this.inner);
+  this.pitch = pitch; this.make = make;
+  this.items = []; this.live = new Map(); this.dirty = false;
+  this.el.addEventListener('scroll', ()=>{ this.dirty = true; schedule(); }, {passive:true});
+}
+VList.prototype.push = function(item){ this.items.push(item); this.dirty = true; };
+VList.prototype.drop = function(i){
+  const node = this.live.get(i);
+  node.querySelectorAll('img').forEach(img=>previews.unobserve(img));
+  node.remove();
+  this.live.delete(i);
+};
+VList.prototype.reset = function(){
+  for(const i of [...this.live.keys()]) this.drop(i);
+  this.items = []; this.dirty = false;
+  this.inner.style.height = '0';
+  this.el.scrollTop = 0;
+};
+VList.prototype.render = function(){
+  if(!this.dirty) return;
+  this.dirty = false;
+  const n = this.items.length, top = this.el.scrollTop, h = this.el.clientHeight || 480;
+  const from = Math.max(0, Math.floor(top/this.pitch) - OVERSCAN);
+  const to = Math.min(n, Math.ceil((top+h)/this.pitch) + OVERSCAN);
+  for(const i of [...this.live.keys()]) if(i < from || i >= to) this.drop(i);
+  const frag = document.createDocumentFragment();
+  for(let i = from; i < to; i++){
+    if(this.live.has(i)) continue;
+    const node = this.make(this.items[i]);
+    node.style.top = (i*this.pitch)+'px';
+    this.live.set(i, node);
+    frag.appendChild(node);
+  }
+  this.inner.appendChild(frag);
+  this.inner.style.height = (n*this.pitch)+'px';
+};
+
+function domRow(d){
+  const cls = CLS_CSS[d.cls] || 'EXTERNAL';
   const row = document.createElement('div');
-  row.className = 'drow '+(CLS_CSS[cls]||'EXTERNAL');
-  row.style.animationDelay = Math.min(domCount*30,600)+'ms';
+  row.className = 'drow '+cls;
   row.innerHTML =
-    '<div class="dname">'+host+'</div>'+
-    '<div class="dtag t'+(cls||'EXTERNAL')+'">'+( CLS_LABEL[cls]||'EXTERNAL' )+'</div>';
-  list.appendChild(row);
+    '<div class="dname clip" title="'+esc(d.host)+'">'+esc(d.host)+'</div>'+
+    '<div class="dtag t'+cls+'">'+(CLS_LABEL[d.cls]||'EXTERNAL')+'</div>';
+  return row;
 }
 
-function addImage(data){
-  const list = document.getElementById('lImg');
-  if(list.querySelector('.empty')) list.innerHTML='';
-  imgCount++;
-  document.getElementById('cImg').textContent = imgCount+' IMAGES';
-  document.getElementById('nImg').textContent = imgCount;
-
+function imgRow(data){
   const hasAlt = data.alt && data.alt.trim().length>0;
   let badges = '<span class="ib '+(hasAlt?'ha':'na')+'">'+(hasAlt?'ALT ✓':'NO ALT')+'</span>';
   if(data.is_external) badges += '<span class="ib ex">EXTERNAL</span>';
-  if(data.host && data.host !== '') badges += '<span class="ib">'+data.host+'</span>';
-  if(data.extra) badges += '<span class="ib">'+data.extra.toUpperCase()+'</span>';
+  if(data.host && data.host !== '') badges += '<span class="ib">'+esc(data.host)+'</span>';
+  if(data.extra) badges += '<span class="ib">'+esc(data.extra.toUpperCase())+'</span>';
 
   const row = document.createElement('div');
   row.className = 'irow2'+(data.is_external?' has-ext':'');
-  row.style.animationDelay = Math.min(imgCount*30,600)+'ms';
-  const safeUrl = data.url.replace(/"/g,'&quot;');
   row.innerHTML =
-    '<div class="ithumb" onclick="openLb(\''+safeUrl+'\')">'
-    +'<img src="'+safeUrl+'" alt="" loading="lazy" '
-    +'onerror="this.parentElement.innerHTML=\'<div class=ph>🖼</div>\'">'
-    +'</div>'
+    '<div class="ithumb"><div class="ph">🖼</div></div>'
     +'<div class="iinfo">'
-    +'<div class="iurl">'+data.url+'</div>'
+    +'<div class="iurl clip" title="'+esc(data.url)+'">'+esc(data.url)+'</div>'
     +'<div class="imeta">'+badges+'</div>'
     +'</div>';
-  list.appendChild(row);
+  if(!data.broken){
+    const box = row.firstChild;
+    // remembered, so a recycled row does not retry a dead image
+    box.replaceChildren(lazyImg(data.url, '', ()=>{ data.broken = true; box.innerHTML = '<div class="ph">🖼</div>'; }));
+  }
+  return row;
 }
 
-function addOcrDomain(data){
-  const list = document.getElementById('lOcr');
-  const wait = document.getElementById('ocrWait');
-  if(wait) wait.remove();
-  ocrCount++;
-  document.getElementById('cOcr').textContent = ocrCount+' FOUND';
-  document.getElementById('nOcr').textContent = ocrCount;
-  document.getElementById('sb4').classList.add('go');
-
+function ocrRow(data){
   const cls = data.cls || 'EXTERNAL';
+  const thumb = data.thumb;
   const row = document.createElement('div');
   row.className = 'orow';
   row.innerHTML =
-    '<div class="ohost">◆ '+data.host+'</div>'
+    '<div class="ohost clip" title="'+esc(data.host)+'">◆ '+esc(data.host)+'</div>'
     +'<div class="ometa">'
-    +(data.thumb ? '<img class="othumb" src="'+data.thumb+'" alt="" onclick="openLb(\''+data.thumb+'\')">' : '')
     +'<span class="obadge">OCR EXTRACTED</span>'
-    +'<span class="obadge t'+cls+'" style="color:inherit">'+cls+'</span>'
-    +'<span class="oraw">"'+data.raw.slice(0,80)+'"</span>'
+    +'<span class="obadge t'+esc(cls)+'" style="color:inherit">'+esc(cls)+'</span>'
+    +'<span class="oraw clip">"'+esc(data.raw.slice(0,80))+'"</span>'
     +'</div>';
-  list.appendChild(row);
+  if(thumb) row.lastChild.prepend(lazyImg(thumb, 'othumb'));
+  return row;
+}
+
+const domList = new VList('lDom', ROW_DOM, domRow);
+const imgList = new VList('lImg', ROW_IMG, imgRow);
+const ocrList = new VList('lOcr', ROW_OCR, ocrRow);
+const lists = [domList, imgList, ocrList];
+
+function log(msg, level='info'){
+  if(!logFrag) logFrag = document.createDocumentFragment();
+  const d = document.createElement('div');
+  d.className = 'll ' + level;
+  const ts = new Date().toISOString().slice(11,23);
+  d.textContent = '['+ts+'] '+msg;
+  logFrag.appendChild(d);
+  schedule();
+}
+
+function flushLog(){
+  if(!logFrag) return;
+  const t = document.getElementById('terminal');
+  t.classList.add('on');
+  t.appendChild(logFrag);
+  logFrag = null;
+  while(t.childElementCount > LOG_MAX) t.firstChild.remove();
+  t.scrollTop = t.scrollHeight;
+}
+
+function setProgress(p){ document.getElementById('pbar').style.width = p+'%'; }
+
+function openLb(src){ document.getElementById('lbImg').src=src; document.getElementById('lb').classList.add('on'); }
+function closeLb(){ document.getElementById('lb').classList.remove('on'); }
+
+// SSE messages only queue their events; each animation frame handles as many
+// as fit in FRAME_BUDGET_MS, then touches the DOM once.
+function enqueue(d){
+  if(d.type === 'job') jobId = d.id;          // needed at once if the scan is replaced before the next frame
+  // close before the server ends the stream: onerror would report a lost
+  // connection and reconnect, and rAF never runs in a background tab
+  if(d.type === 'done' && es){ es.close(); es=null; }
+  queue.push(d);
+  schedule();
+}
+
+function schedule(){
+  if(frameQueued) return;
+  frameQueued = true;
+  requestAnimationFrame(flush);
+}
+
+function flush(){
+  frameQueued = false;
+  const t0 = performance.now();
+  while(qHead < queue.length){
+    handle(queue[qHead++]);
+    if((qHead & 63) === 0 && performance.now() - t0 > FRAME_BUDGET_MS) break;
+  }
+  if(qHead >= queue.length){ queue = []; qHead = 0; }
+  else schedule();
+  flushLog();
+  if(countsDirty){
+    countsDirty = false;
+    document.getElementById('cDom').textContent = domList.items.length+' HOSTS';
+    document.getElementById('nDom').textContent = domList.items.length;
+    document.getElementById('cImg').textContent = imgList.items.length+' IMAGES';
+    document.getElementById('nImg').textContent = imgList.items.length;
+    if(ocrList.items.length){
+      document.getElementById('cOcr').textContent = ocrList.items.length+' FOUND';
+      document.getElementById('nOcr').textContent = ocrList.items.length;
+    }
+  }
+  lists.forEach(l=>l.render());
+}
+
+function show(panel, list){
+  const p = document.getElementById(panel);
+  if(p.classList.contains('on')) return;
+  p.classList.add('on');
+  list.dirty = true;
+}
+
+function handle(d){
+  if(d.type === 'ping') return;
+
+  if(d.type === 'thumb'){
+    thumbs[d.id] = d.data;
+    return;
+  }
+
+  if(d.type === 'transport'){
+    log('Stream: '+d.events+' event(s) in '+d.frames+' frame(s), '
+        +Math.round(d.wire_bytes/1024)+' KB on the wire ('+Math.round(d.raw_bytes/1024)+' KB raw), '
+        +d.events_per_sec+' ev/s','info');
+    return;
+  }
+
+  if(d.type === 'job'){
+    log('Job '+d.id+' — attach from elsewhere via /jobs/'+d.id+'/stream','info');
+    return;
+  }
+
+  if(d.type === 'log'){
+    log(d.msg, d.level||'info');
+    return;
+  }
+
+  if(d.type === 'domain'){
+    show('pDom', domList);
+    domList.push(d);
+    countsDirty = true;
+    return;
+  }
+
+  if(d.type === 'image'){
+    show('pImg', imgList);
+    imgList.push(d);
+    countsDirty = true;
+    return;
+  }
+
+  if(d.type === 'stats'){
+    document.getElementById('nImg').textContent = d.images;
+    document.getElementById('nDom').textContent = d.domains;
+    document.getElementById('nSub').textContent = d.subdomains;
+    document.getElementById('nExt').textContent = d.third_party;
+    document.getElementById('stats').classList.add('on');
+    show('pOcr', ocrList);
+    ['sb0','sb1','sb2','sb3'].forEach((id,i)=>
+      setTimeout(()=>document.getElementById(id).classList.add('go'),i*90));
+    setProgress(70);
+    return;
+  }
+
+  if(d.type === 'ocr_domain'){
+    const wait = document.getElementById('ocrWait');
+    if(wait) wait.remove();
+    document.getElementById('sb4').classList.add('go');
+    // thumb ids restart on every (re)connection: resolve now, not when the row is drawn
+    if(!d.thumb && d.thumb_id) d.thumb = thumbs[d.thumb_id];
+    ocrList.push(d);
+    countsDirty = true;
+    return;
+  }
+
+  if(d.type === 'stats_ocr'){
+    document.getElementById('nOcr').textContent = d.ocr;
+    return;
+  }
+
+  if(d.type === 'crawl_progress'){
+    document.getElementById('sysStatus').textContent =
+      'CRAWLING '+d.pages+'/'+d.max_pages+' · '+d.frontier+' QUEUED · '+d.pages_per_sec+' P/S';
+    setProgress(5 + Math.round((d.pages / d.max_pages) * 60));
+    return;
+  }
+
+  if(d.type === 'ocr_progress'){
+    const pct = 70 + Math.round((d.idx / d.total) * 28);
+    setProgress(pct);
+    return;
+  }
+
+  if(d.type === 'done'){
+    setProgress(100);
+    document.getElementById('scanBtn').disabled = false;
+    document.getElementById('sysStatus').textContent = 'DONE';
+    // If no OCR domains found
+    const wait = document.getElementById('ocrWait');
+    if(wait) wait.textContent = 'No domains found in image text.';
+    return;
+  }
 }
 
 function resetUI(){
-  domCount=0; imgCount=0; ocrCount=0;
+  thumbs={}; queue=[]; qHead=0; logFrag=null; countsDirty=false; jobId=null;
+  lists.forEach(l=>l.reset());
   ['pDom','pImg','pOcr'].forEach(id=>document.getElementById(id).classList.remove('on'));
-  ['lDom','lImg'].forEach(id=>document.getElementById(id).innerHTML='');
-  document.getElementById('lOcr').innerHTML='<div class="empty" id="ocrWait">Waiting for OCR results …</div>';
+  if(!document.getElementById('ocrWait')){
+    const wait = document.createElement('div');
+    wait.className = 'empty'; wait.id = 'ocrWait';
+    document.getElementById('lOcr').prepend(wait);
+  }
+  document.getElementById('ocrWait').textContent = 'Waiting for OCR results …';
   document.getElementById('stats').classList.remove('on');
   document.querySelectorAll('.sbox').forEach(b=>b.classList.remove('go'));
   ['nImg','nDom','nSub','nExt'].forEach(id=>document.getElementById(id).textContent='0');
@@ -767,87 +3383,45 @@ function resetUI(){
 }
 
 function startScan(){
-  if(es){ es.close(); es=null; }
+  if(es){
+    es.close(); es=null;
+    if(jobId) fetch('/jobs/'+jobId, {method:'DELETE'});
+  }
   const target = document.getElementById('urlIn').value.trim();
   if(!target){ alert('Enter a URL or file path.'); return; }
   const doOcr = document.getElementById('ocrCheck').checked ? '1' : '0';
+  const mode  = document.getElementById('ocrMode').value;
+  const depth = document.getElementById('crawlDepth').value;
+  const strm  = document.getElementById('streamCheck').checked ? '1' : '0';
+  const text  = document.getElementById('textCheck').checked ? '1' : '0';
 
   resetUI();
   document.getElementById('scanBtn').disabled = true;
   document.getElementById('sysStatus').textContent = 'SCANNING …';
   setProgress(5);
 
-  es = new EventSource('/scan?target='+encodeURIComponent(target)+'&ocr='+doOcr);
-  let domsDone=false, imgsDone=false;
+  const src = new EventSource('/scan?target='+encodeURIComponent(target)+'&ocr='+doOcr+'&mode='+mode+'&depth='+depth+'&stream='+strm
+                             +'&text='+text+'&batch=1&compress=1');
+  es = src;
 
-  es.onmessage = function(e){
+  src.onmessage = function(e){
+    if(src !== es) return;                    // a newer scan replaced this one
     const d = JSON.parse(e.data);
+    if(d.type === 'batch') d.events.forEach(enqueue);
+    else enqueue(d);
+  };
 
-    if(d.type === 'ping') return;
-
-    if(d.type === 'log'){
-      log(d.msg, d.level||'info');
-      return;
-    }
-
-    if(d.type === 'domain'){
-      if(!domsDone){ domsDone=true; document.getElementById('pDom').classList.add('on'); }
-      addDomain(d.host, d.cls);
-      return;
-    }
-
-    if(d.type === 'image'){
-      if(!imgsDone){ imgsDone=true; document.getElementById('pImg').classList.add('on'); }
-      addImage(d);
-      return;
-    }
-
-    if(d.type === 'stats'){
-      document.getElementById('nImg').textContent = d.images;
-      document.getElementById('nDom').textContent = d.domains;
-      document.getElementById('nSub').textContent = d.subdomains;
-      document.getElementById('nExt').textContent = d.third_party;
-      document.getElementById('stats').classList.add('on');
-      document.getElementById('pOcr').classList.add('on');
-      ['sb0','sb1','sb2','sb3'].forEach((id,i)=>
-        setTimeout(()=>document.getElementById(id).classList.add('go'),i*90));
-      setProgress(70);
-      return;
-    }
-
-    if(d.type === 'ocr_domain'){
-      addOcrDomain(d);
-      return;
-    }
-
-    if(d.type === 'stats_ocr'){
-      document.getElementById('nOcr').textContent = d.ocr;
-      return;
-    }
-
-    if(d.type === 'ocr_progress'){
-      const pct = 70 + Math.round((d.idx / d.total) * 28);
-      setProgress(pct);
-      return;
-    }
-
-    if(d.type === 'done'){
-      setProgress(100);
-      document.getElementById('scanBtn').disabled = false;
-      document.getElementById('sysStatus').textContent = 'DONE';
-      es.close(); es=null;
-      // If no OCR domains found
-      const wait = document.getElementById('ocrWait');
-      if(wait) wait.textContent = 'No domains found in image text.';
+  src.onerror = function(){
+    if(src !== es) return;
+    if(src.readyState === EventSource.CONNECTING){
+      // the browser reconnects with Last-Event-ID and the server resumes the same scan
+      log('Connection lost — resuming …','warn');
       return;
     }
-  };
-
-  es.onerror = function(){
     log('Connection error or scan finished.','warn');
     document.getElementById('scanBtn').disabled = false;
     document.getElementById('sysStatus').textContent = 'ERROR';
-    if(es){ es.close(); es=null; }
+    src.close(); es=null;
   };
 }
 </script>
@@ -856,9 +3430,4 @@ function startScan(){
 """
 
 if __name__ == '__main__':
-    print("\n  CYBERSCOPE Flask Server")
-    print("  ─────────────────────────────────────")
-    print("  http://localhost:8000")
-    print("  OCR available:", OCR_AVAILABLE)
-    print("  Press Ctrl+C to quit\n")
-    app.run(host='0.0.0.0', port=8000, debug=False, threaded=True)
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+CYBERSCOPE — offline benchmarks
+Run: python3 bench.py ocr [--images DIR] [--json FILE]
+     python3 bench.py psl [-n HOSTS] [--json FILE]
+     python3 bench.py suite [--sizes 200,2000,20000] [--no-ocr] [--json FILE]
+     python3 bench.py startup [-n RUNS] [--json FILE]
+     python3 bench.py compare OLD.json NEW.json [--tolerance 0.1]
+"""
+
+import sys, io, os, time, json, random, argparse, platform, threading, statistics, subprocess, http.server
+from contextlib import contextmanager
+from pathlib import Path
+
+import app
+
+# ═══════════════════════════════════════════════════════════════
+#  SYNTHETIC INPUTS
+# ═══════════════════════════════════════════════════════════════
+
+WORDS = ['visit', 'shop', 'news', 'contact', 'support', 'free', 'sale', 'today', 'login', 'mail']
+TLDS  = ['com', 'net', 'org', 'io', 'co.uk', 'com.tr', 'dev']
+
+def synth_domain(rng: random.Random) -> str:
+    return f'{rng.choice(WORDS)}{rng.randint(1, 999)}.{rng.choice(TLDS)}'
+
+def synth_images(n: int = 12, seed: int = 1):
+    """(name, PIL image, expected domains) covering banners, posters and sparse art."""
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        kind = ('banner', 'poster', 'sparse', 'blank')[i % 4]
+        if kind == 'banner':
+            img = Image.new('RGB', (728, 90), 'white')
+            dom = synth_domain(rng)
+            ImageDraw.Draw(img).text((20, 35), f'{rng.choice(WORDS).upper()} at {dom}', fill='black')
+            doms = {dom}
+        elif kind == 'poster':
+            img = Image.new('RGB', (400, 500), (240, 240, 230))
+            d = ImageDraw.Draw(img)
+            doms = set()
+            for row in range(6):
+                dom = synth_domain(rng)
+                doms.add(dom)
+                d.text((20, 30 + row * 70), f'{rng.choice(WORDS)} {dom} {rng.choice(WORDS)}', fill='black')
+        elif kind == 'sparse':
+            img = Image.new('RGB', (600, 600), 'white')
+            dom = synth_domain(rng)
+            ImageDraw.Draw(img).text((rng.randint(10, 400), rng.randint(10, 550)), dom, fill='black')
+            doms = {dom}
+        else:
+            img = Image.new('RGB', (300, 300), (rng.randint(0, 255),) * 3)
+            doms = set()
+        out.append((f'{kind}-{i}', img, doms))
+    return out
+
+def synth_hosts(n: int = 50000, seed: int = 1) -> list:
+    """Hostnames over a sample of real PSL suffixes, 1-3 labels deep."""
+    rng = random.Random(seed)
+    rules = []
+    try:
+        for line in Path(app.PSL_FILE).read_text(encoding='utf-8').splitlines():
+            r = line.split(None, 1)[0] if line.strip() else ''
+            if r and not r.startswith('//') and r.isascii(): rules.append(r.lstrip('!*.'))
+    except OSError:
+        rules = sorted(app.PSL)
+    rules += ['com', 'net', 'org'] * 200
+    return ['.'.join(rng.choice(WORDS) + str(rng.randint(0, 99)) for _ in range(rng.randint(1, 3)))
+            + '.' + rng.choice(rules) for _ in range(n)]
+
+HOST_KINDS = (('sub', 0.25), ('cdn', 0.25), ('tracker', 0.15), ('external', 0.35))
+
+def synth_host_pool(n: int = 300, seed: int = 1, base: str = 'bench.test') -> list:
+    """Hosts spread over subdomains of `base`, known CDNs and trackers, and unrelated sites."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        r, kind = rng.random(), 'external'
+        for k, p in HOST_KINDS:
+            if r < p: kind = k; break
+            r -= p
+        if kind == 'sub':       out.append(f'{rng.choice(WORDS)}{i}.{base}')
+        elif kind == 'cdn':     out.append(f'c{i}.' + rng.choice(app.CDN_SUFFIXES))
+        elif kind == 'tracker': out.append(f't{i}.' + rng.choice(app.TRACKER_SUFFIXES))
+        else:                   out.append(f'{rng.choice(WORDS)}{i}.{rng.choice(TLDS)}')
+    return out
+
+def synth_html(n_tags: int, seed: int = 1, srcset: float = 0.6, local_images: int = 0) -> str:
+    """A page of roughly `n_tags` tags: images (many with srcset), links, scripts,
+    stylesheets, iframes and filler. With `local_images`, every image points at
+    /img/<k>.png on the page's own origin (k < local_images) so it can be served."""
+    rng = random.Random(seed)
+    hosts = synth_host_pool(seed=seed)
+    parts = ['<!DOCTYPE html><html><head><title>bench</title>']
+    for i in range(n_tags):
+        h = rng.choice(hosts)
+        r = rng.random()
+        if r < 0.35:
+            src = f'/img/{i % local_images}.png' if local_images else f'https://{h}/img/{i}.jpg'
+            tag = f'<img src="{src}" alt="{rng.choice(WORDS) if rng.random() < 0.7 else ""}"'
+            if rng.random() < srcset:
+                tag += ' srcset="' + ', '.join(f'{src}?w={w} {w}w' for w in (320, 640, 1280, 1920)) + '"'
+            parts.append(tag + '>')
+        elif r < 0.6:  parts.append(f'<a href="https://{h}/{rng.choice(WORDS)}/{i}">{rng.choice(WORDS)}</a>')
+        elif r < 0.7:  parts.append(f'<script src="https://{h}/js/{i}.js"></script>')
+        elif r < 0.78: parts.append(f'<link rel="stylesheet" href="https://{h}/css/{i}.css">')
+        elif r < 0.8:  parts.append(f'<iframe src="https://{h}/embed/{i}"></iframe>')
+        else:          parts.append(f'<div class="c{i % 17}"><p>{" ".join(rng.choices(WORDS, k=8))}</p></div>')
+    parts.append('</body></html>')
+    return '\n'.join(parts)
+
+def synth_text(n_kb: int, seed: int = 1) -> str:
+    """OCR-like text: words, punctuation and a domain or URL every few lines."""
+    rng = random.Random(seed)
+    lines, size = [], 0
+    while size < n_kb * 1024:
+        words = rng.choices(WORDS, k=rng.randint(3, 12))
+        if rng.random() < 0.3:
+            dom = synth_domain(rng)
+            words.insert(rng.randrange(len(words)), rng.choice((dom, f'www.{dom}', f'https://{dom}/{rng.choice(WORDS)}')))
+        line = ' '.join(words) + rng.choice(('.', ',', '!', ''))
+        lines.append(line)
+        size += len(line) + 1
+    return '\n'.join(lines)
+
+def png_bytes(img) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+class _StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    routes = {}
+
+    def do_GET(self):
+        body = self.routes.get(self.path.split('?', 1)[0])
+        if body is None:
+            self.send_response(404); self.send_header('Content-Length', '0'); self.end_headers()
+            return
+        ctype, data = body
+        self.send_response(200)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args): pass
+
+@contextmanager
+def stand_in(routes: dict):
+    """Serve {path: (content type, bytes)} on a local port; yields its base URL."""
+    handler = type('Handler', (_StandInHandler,), {'routes': routes})
+    srv = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try: yield f'http://127.0.0.1:{srv.server_port}'
+    finally: srv.shutdown(); srv.server_close()
+
+def load_images(folder: str):
+    from PIL import Image
+    out = []
+    for p in sorted(Path(folder).iterdir()):
+        try: out.append((p.name, Image.open(p).convert('RGB'), None))
+        except Exception: pass
+    return out
+
+# ═══════════════════════════════════════════════════════════════
+#  BENCHMARKS
+# ═══════════════════════════════════════════════════════════════
+
+def bench_ocr(images) -> dict:
+    """Passes, time and domain recall of every OCR mode against 'exhaustive'."""
+    found = {}
+    report = {}
+    for mode in app.OCR_MODES:
+        passes = 0
+        t0 = time.perf_counter()
+        found[mode] = []
+        for name, img, _ in images:
+            text, n = app.ocr_image(img, mode)
+            passes += n
+            found[mode].append({d['host'].lower() for d in app.extract_domains_from_text(text, ocr=True)})
+        report[mode] = {'seconds': round(time.perf_counter() - t0, 3), 'passes': passes}
+
+    base = found['exhaustive']
+    truth = [doms for _, _, doms in images]
+    for mode, r in report.items():
+        r['passes_saved'] = report['exhaustive']['passes'] - r['passes']
+        hit = sum(len(f & b) for f, b in zip(found[mode], base))
+        r['recall_vs_exhaustive'] = round(hit / max(1, sum(map(len, base))), 3)
+        if all(t is not None for t in truth):
+            hit = sum(len(f & t) for f, t in zip(found[mode], truth))
+            r['recall_vs_truth'] = round(hit / max(1, sum(map(len, truth))), 3)
+    return {'images': len(images), 'modes': report}
+
+def bench_triage(images) -> dict:
+    """text_score() of every image against OCR_MIN_SCORE; `missed` are images with text it would skip."""
+    rows, missed, skipped = {}, [], 0
+    for name, img, doms in images:
+        score, feats = app.text_score(img)
+        rows[name] = {'score': score, 'ink': feats.get('ink', ''), 'entropy': feats.get('entropy', ''),
+                      'reason': feats.get('reason', '')}
+        if score < app.OCR_MIN_SCORE:
+            skipped += 1
+            if doms: missed.append(name)
+    return {'min_score': app.OCR_MIN_SCORE, 'skipped': skipped, 'missed': missed, 'images': rows}
+
+def base_domain_legacy(hostname: str) -> str:
+    """base_domain as it was before the full PSL: two-label suffixes only."""
+    if not hostname: return ''
+    hostname = hostname.lower().rstrip('.').split(':')[0]
+    parts = hostname.split('.')
+    if len(parts) <= 1: return hostname
+    if len(parts) >= 3:
+        two = '.'.join(parts[-2:])
+        if two in app.PSL:
+            return '.'.join(parts[-3:])
+    return '.'.join(parts[-2:])
+
+def _rate(fn, items) -> float:
+    t0 = time.perf_counter()
+    for x in items: fn(x)
+    return round(len(items) / (time.perf_counter() - t0))
+
+def bench_psl(hosts: list) -> dict:
+    """Lookups/sec of the legacy and PSL-trie base_domain, and how often they disagree."""
+    t0 = time.perf_counter()
+    index = app.SuffixIndex()
+    try: index.load(app.PSL_FILE)
+    except OSError: pass
+    load_ms = round((time.perf_counter() - t0) * 1000, 1)
+    trie = app.base_domain.__wrapped__
+    app.base_domain.cache_clear()
+    rows = {
+        'legacy':       {'lookups_per_sec': _rate(base_domain_legacy, hosts)},
+        'psl_trie':     {'lookups_per_sec': _rate(trie, hosts)},
+        'psl_memoized': {'lookups_per_sec': _rate(app.base_domain, hosts + hosts)},
+    }
+    diff = [(h, base_domain_legacy(h), trie(h)) for h in hosts if base_domain_legacy(h) != trie(h)]
+    return {'hosts': len(hosts), 'rules': index.size, 'load_ms': load_ms, 'functions': rows,
+            'disagreements': len(diff), 'examples': diff[:10]}
+
+def parser_backends() -> dict:
+    """{suffix: parser class}: the stdlib PageParser, plus lxml when installed."""
+    out = {'': app.PageParser}
+    if app.lxml_available(): out['_lxml'] = app.LxmlPageParser
+    return out
+
+# inline markup where the two tokenizers report text and end tags differently
+PARITY_SNIPPETS = (
+    '<p><b>contact</b>sales.example.org</p>',
+    '<p>mail <i>us</i> at <a href="mailto:x">team</a>.example.net today</p>',
+    '<div>shop<span>.example.com</span> and <em>www</em>.example.io</div>',
+    '<p>see<br>www.example.org</p><p>one.example.com</p><p>two.example.com</p>',
+    '<ul><li>first.example.com<li>second.example.com</ul>',
+    '<p>unclosed <b>bold foo.example.org<p>next.example.net',
+    '<script>var u = "https://cdn.example.com/x.js"; this.style.x = 1</script>after.example.io',
+    '<style>body{background:url(https://img.example.com/bg.png)}</style><p>text.example.dev</p>',
+    '<!-- hidden.example.com --><p>shown<!-- -->.example.com</p>',
+)
+
+def parser_parity(sizes: list = (200,)) -> list:
+    """Inputs (PARITY_SNIPPETS and synthetic pages of `sizes` tags) on which the
+    lxml backend reports other hosts, text hosts, images or links than the
+    stdlib PageParser; empty without lxml."""
+    if not app.lxml_available(): return []
+    def result(cls, html):
+        p = cls('https://www.bench.test/', scan_text=True)
+        p.feed(html); p.close()
+        return sorted(p.hosts), sorted(p.text_hosts), list(p.images.rows()), p.links
+    pages = [(f'snippet-{i}', html) for i, html in enumerate(PARITY_SNIPPETS)]
+    pages += [(f'{n}_tags', synth_html(n)) for n in sizes]
+    return [name for name, html in pages if result(app.PageParser, html) != result(app.LxmlPageParser, html)]
+
+def bench_parse(sizes: list, repeat: int = 3) -> dict:
+    """PageParser throughput over synthetic pages of each size (best of
+    `repeat`), once per backend; lxml rows are suffixed _lxml."""
+    out = {}
+    for n in sizes:
+        html = synth_html(n)
+        for suffix, cls in parser_backends().items():
+            best = float('inf')
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                parser = cls('https://www.bench.test/')
+                parser.feed(html); parser.close()
+                best = min(best, time.perf_counter() - t0)
+            out[f'{n}_tags{suffix}'] = {'kb': len(html) // 1024, 'images': len(parser.images),
+                                        'hosts': len(parser.hosts), 'seconds': round(best, 4),
+                                        'pages_per_sec': round(1 / best, 1),
+                                        'mb_per_sec': round(len(html) / best / 1048576, 2),
+                                        'tags_per_sec': round(n / best)}
+    return out
+
+def bench_classify(n: int = 50000) -> dict:
+    """base_domain and classify rates, cold (caches cleared) and memoized."""
+    pool = synth_host_pool(n // 10 or 1)
+    rng = random.Random(2)
+    hosts = [rng.choice(pool) for _ in range(n)]
+    app.base_domain.cache_clear(); app.classify.cache_clear()
+    rows = {'base_domain':       {'per_sec': _rate(app.base_domain.__wrapped__, hosts)},
+            'classify':          {'per_sec': _rate(lambda h: app.classify.__wrapped__(h, 'bench.test'), hosts)}}
+    app.base_domain.cache_clear(); app.classify.cache_clear()
+    rows['classify_memoized'] = {'per_sec': _rate(lambda h: app.classify(h, 'bench.test'), hosts)}
+    return {'lookups': n, 'distinct_hosts': len(set(hosts)), 'functions': rows}
+
+def bench_extract(sizes_kb: list, repeat: int = 3) -> dict:
+    """extract_domains_from_text over OCR-like text of each size."""
+    out = {}
+    for kb in sizes_kb:
+        text = synth_text(kb)
+        best = float('inf')
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            found = app.extract_domains_from_text(text, ocr=True)
+            best = min(best, time.perf_counter() - t0)
+        out[f'{kb}_kb'] = {'domains': len(found), 'seconds': round(best, 4),
+                           'mb_per_sec': round(len(text) / best / 1048576, 2)}
+    return out
+
+class _Events(list):
+    put = list.append
+
+def bench_scan(sizes: list, ocr: bool = False, n_images: int = 24) -> dict:
+    """Full run_scan against the local stand-in: latency, event count, stage
+    timings and RSS. With `ocr`, pages reference `n_images` generated images
+    served by the stand-in and the OCR phase runs with a cold cache."""
+    routes = {}
+    if ocr:
+        for i, (_, img, _) in enumerate(synth_images(n_images, seed=7)):
+            img.putpixel((0, 0), (i % 256, i // 256, 0))    # distinct bytes, no OCR cache sharing
+            routes[f'/img/{i}.png'] = ('image/png', png_bytes(img))
+    for n in sizes:
+        html = synth_html(n, seed=n, local_images=n_images if ocr else 0)
+        routes[f'/page/{n}.html'] = ('text/html; charset=utf-8', html.encode())
+    out = {}
+    with stand_in(routes) as base:
+        for n in sizes:
+            if ocr: app.OCR_CACHE = app.OCRCache(cache_dir='')
+            events = _Events()
+            t0 = time.perf_counter()
+            app.run_scan(f'{base}/page/{n}.html', ocr, events, incremental=False)
+            seconds = time.perf_counter() - t0
+            by_type = {}
+            for e in events: by_type.setdefault(e['type'], []).append(e)
+            row = {'seconds': round(seconds, 4), 'events': len(events),
+                   'domains': len(by_type.get('domain', ())), 'images': len(by_type.get('image', ()))}
+            if by_type.get('memory'): row.update(by_type['memory'][-1]); row.pop('type')
+            if by_type.get('stats_ocr'):
+                s = by_type['stats_ocr'][-1]
+                row['ocr'] = {k: s[k] for k in ('images', 'passes', 'ocr', 'skipped', 'seconds', 'images_per_sec')}
+            if by_type.get('timings'): row['stages'] = by_type['timings'][-1]['stages']
+            out[f'{n}_tags'] = row
+    return out
+
+def run_suite(sizes: list, ocr: bool) -> dict:
+    result = {'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'sizes': sizes,
+                       'ocr': ocr, 'psl_rules': app.psl_index().size},
+              'parse': bench_parse(sizes),
+              'classify': bench_classify(),
+              'extract': bench_extract([16, 256, 2048])}
+    result['scan'] = bench_scan(sizes, ocr=ocr)
+    return result
+
+STARTUP_PROBE = r"""
+import sys, time, json
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.classify('cdn.example.com', app.base_domain('www.example.com'))
+t2 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'first_classify_ms': (t2 - t1) * 1000,
+                  'modules': len(sys.modules), 'flask_loaded': 'flask' in sys.modules,
+                  'pil_loaded': 'PIL' in sys.modules}))
+"""
+
+def bench_startup(runs: int = 7) -> dict:
+    """Cold start of a fresh interpreter: importing app, then the first
+    classification (which loads the PSL), medians over `runs` processes."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=here, capture_output=True,
+                             text=True, check=True).stdout
+        samples.append(dict(json.loads(out), process_ms=(time.perf_counter() - t0) * 1000))
+    row = {k: round(statistics.median(s[k] for s in samples), 1)
+           for k in ('import_ms', 'first_classify_ms', 'process_ms', 'modules')}
+    row.update(flask_loaded=samples[0]['flask_loaded'], pil_loaded=samples[0]['pil_loaded'])
+    return {'runs': runs, 'cold_start': row}
+
+LOWER_IS_BETTER = ('seconds', 'import_ms', 'first_classify_ms', 'process_ms', 'rss_peak_mb', 'rss_end_mb', 'passes')
+
+def compare(old, new, tolerance: float = 0.1, path: str = '') -> list:
+    """(metric, old, new, change) for every shared rate or timing that got
+    worse by more than `tolerance`."""
+    out = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        for k in old.keys() & new.keys():
+            if k != 'meta': out += compare(old[k], new[k], tolerance, f'{path}.{k}' if path else k)
+        return sorted(out)
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (old, new)) or not old:
+        return out
+    key = path.rsplit('.', 1)[-1]
+    if key.endswith('per_sec'): change = (old - new) / old
+    elif key in LOWER_IS_BETTER:  change = (new - old) / old
+    else: return out
+    if change > tolerance: out.append((path, old, new, round(change, 3)))
+    return out
+
+def print_table(title: str, rows: dict):
+    print(f'\n  {title}')
+    print('  ' + '─' * 60)
+    cols = sorted({k for r in rows.values() for k in r})
+    print('  ' + f'{"":14}' + ''.join(f'{c:>22}' for c in cols))
+    for name, r in rows.items():
+        print('  ' + f'{name:14}' + ''.join(f'{str(r.get(c, "")):>22}' for c in cols))
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json', help='also write results to this file')
+    ap = argparse.ArgumentParser(description='CYBERSCOPE offline benchmarks')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('ocr', parents=[common], help='OCR triage and OCR modes (Pillow; modes need tesseract)')
+    p.add_argument('--images', help='folder of real images instead of synthetic ones')
+    p.add_argument('-n', type=int, default=12, help='number of synthetic images')
+    p = sub.add_parser('psl', parents=[common], help='base_domain: full PSL trie vs the legacy lookup')
+    p.add_argument('-n', type=int, default=50000, help='number of synthetic hosts')
+    p = sub.add_parser('suite', parents=[common], help='parser, classifier, extractor and full-scan benchmarks')
+    p.add_argument('--sizes', default='200,2000,20000', help='comma-separated page sizes in tags')
+    p.add_argument('--no-ocr', action='store_true', help='skip the OCR phase in the scan benchmark')
+    p = sub.add_parser('parse', parents=[common], help='PageParser pages per second, stdlib vs lxml backend')
+    p.add_argument('--sizes', default='200,2000,20000', help='comma-separated page sizes in tags')
+    p.add_argument('--repeat', type=int, default=3, help='runs per size, best is kept')
+    p = sub.add_parser('startup', parents=[common], help='cold-start time of a fresh process importing app')
+    p.add_argument('-n', type=int, default=7, help='number of processes')
+    p = sub.add_parser('compare', help='list regressions between two suite JSON files')
+    p.add_argument('old'); p.add_argument('new')
+    p.add_argument('--tolerance', type=float, default=0.1, help='allowed slowdown (0.1 = 10%%)')
+    args = ap.parse_args(argv)
+
+    if args.cmd == 'compare':
+        worse = compare(json.loads(Path(args.old).read_text()), json.loads(Path(args.new).read_text()),
+                        args.tolerance)
+        for metric, old, new, change in worse: print(f'  {metric:60} {old:>12} → {new:<12} {change:+.1%}')
+        print(f'\n  {len(worse)} regression(s) beyond {args.tolerance:.0%}.')
+        sys.exit(1 if worse else 0)
+
+    if args.cmd == 'ocr':
+        images = load_images(args.images) if args.images else synth_images(args.n)
+        result = {'triage': bench_triage(images)}
+        t = result['triage']
+        print_table(f'Triage — OCR_MIN_SCORE {t["min_score"]}, {t["skipped"]} skipped', t['images'])
+        if t['missed']:
+            print(f'\n  text_score() would skip {len(t["missed"])} image(s) with text: {", ".join(t["missed"])}')
+        if app.ocr_available():
+            result['ocr'] = bench_ocr(images)
+            print_table(f'OCR modes — {len(images)} image(s)', result['ocr']['modes'])
+        else:
+            print('\n  pytesseract/tesseract not installed — OCR modes skipped.')
+
+    if args.cmd == 'psl':
+        result = {'psl': bench_psl(synth_hosts(args.n))}
+        r = result['psl']
+        print_table(f'base_domain — {r["hosts"]} host(s), {r["rules"]} rule(s) loaded in {r["load_ms"]} ms',
+                    r['functions'])
+        print(f'\n  {r["disagreements"]} host(s) get a different base domain, e.g.:')
+        for h, old, new in r['examples']: print(f'    {h:40} {old:28} → {new}')
+
+    if args.cmd == 'parse':
+        sizes = [int(x) for x in args.sizes.split(',') if x.strip()]
+        if not app.lxml_available(): print('  lxml not installed — stdlib parser only.')
+        result = {'parse': bench_parse(sizes, args.repeat), 'parity': parser_parity(sizes)}
+        print_table('PageParser', result['parse'])
+        if result['parity']:
+            print(f'\n  lxml and stdlib backends differ on: {", ".join(result["parity"])}')
+
+    if args.cmd == 'startup':
+        result = {'startup': bench_startup(args.n)}
+        print_table(f'cold start — median of {args.n} process(es)', {'app': result['startup']['cold_start']})
+
+    if args.cmd == 'suite':
+        sizes = [int(x) for x in args.sizes.split(',') if x.strip()]
+        ocr = not args.no_ocr and app.ocr_available()
+        if not args.no_ocr and not ocr: print('  pytesseract/Pillow not installed — scanning without OCR.')
+        result = run_suite(sizes, ocr)
+        print_table('PageParser', result['parse'])
+        print_table(f'classify — {result["classify"]["lookups"]} lookup(s)', result['classify']['functions'])
+        print_table('extract_domains_from_text', result['extract'])
+        print_table('run_scan' + (' with OCR' if ocr else ''),
+                    {k: {c: v[c] for c in ('seconds', 'events', 'domains', 'images', 'rss_peak_mb') if c in v}
+                     for k, v in result['scan'].items()})
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+    if (args.cmd == 'ocr' and result['triage']['missed']) or (args.cmd == 'parse' and result['parity']):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()